@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for ``towel.paginator.Page.page_range`` with huge page
+counts. Compares the window-based implementation with the previous
+implementation which looped over all pages::
+
+    cd tests
+    ./benchmark_paginator.py
+"""
+
+import os
+import sys
+import timeit
+from os.path import abspath, dirname
+
+
+def full_loop_page_range(page):
+    from towel.paginator import PAGINATION, filter_adjacent
+
+    num_pages = page.paginator.num_pages
+    return list(
+        filter_adjacent(
+            (
+                i
+                if i <= PAGINATION["START"]
+                or i > num_pages - PAGINATION["END"]
+                or abs(page.number - i) <= PAGINATION["AROUND"]
+                else None
+            )
+            for i in range(1, num_pages + 1)
+        )
+    )
+
+
+def window_page_range(page):
+    page.__dict__.pop("page_range", None)  # Measure without memoization
+    return page.page_range
+
+
+def main():
+    from towel.paginator import Paginator
+
+    for num_pages in (100, 10000, 500000):
+        page = Paginator(range(num_pages * 10), 10).page(num_pages // 2)
+        assert full_loop_page_range(page) == window_page_range(page)
+
+        print("%s pages" % num_pages)
+        for fn in (full_loop_page_range, window_page_range):
+            number = (
+                max(1, 1000000 // num_pages) if fn is full_loop_page_range else 10000
+            )
+            seconds = timeit.timeit(lambda: fn(page), number=number)
+            print("  %-22s %10.2f us" % (fn.__name__, seconds / number * 1e6))
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testapp.settings")
+    sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+    import django
+
+    django.setup()
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for ``towel.quick.parse_quickadd`` with long quick strings
+and many rules. Compares the single-pass scanner with the previous
+implementation which tried every rule at every position::
+
+    cd tests
+    ./benchmark_quick.py
+"""
+
+import os
+import random
+import re
+import sys
+import timeit
+from os.path import abspath, dirname
+
+
+def sequential_parse_quickadd(quick, regexes):
+    from django.utils.datastructures import MultiValueDict
+
+    data = {}
+    rest = []
+
+    while quick:
+        for regexp, extract in regexes:
+            match = regexp.match(quick)
+            if match:
+                for key, value in extract(match.groupdict()).items():
+                    data.setdefault(key, []).append(value)
+
+                quick = quick[len(match.group(0)) : 9999].strip()
+                break
+
+        else:
+            splitted = quick.split(" ", 1)
+            if len(splitted) < 2:
+                rest.append(quick)
+                break
+
+            rest.append(splitted[0])
+            quick = splitted[1]
+
+    return MultiValueDict(data), rest
+
+
+def rules(count):
+    from towel import quick
+
+    rules = [
+        (re.compile(r"!!"), quick.static(important=True)),
+        (re.compile(r"=(?P<estimated_hours>[\d\.]+)h"), quick.identity()),
+        (re.compile(r"is:(?P<bool>\w+)", re.I), quick.bool_mapper("is_active")),
+    ]
+    for i in range(count - len(rules)):
+        rules.append((re.compile(r"tag%s:(?P<value>[^\s]+)" % i), quick.static(tag=i)))
+    return rules
+
+
+def quick_string(words):
+    random.seed(words)
+    tokens = ["!!", "=1.5h", "is:yes", "tag3:x", "lorem", "ipsum", "dolor", " "]
+    return " ".join(random.choice(tokens) for i in range(words))
+
+
+def main():
+    from towel.quick import parse_quickadd
+
+    for count, words in ((5, 10), (50, 10), (50, 1000), (200, 1000)):
+        regexes = rules(count)
+        quick = quick_string(words)
+        assert parse_quickadd(quick, regexes) == sequential_parse_quickadd(
+            quick, regexes
+        )
+
+        print("%s rules, %s words" % (count, words))
+        for fn in (sequential_parse_quickadd, parse_quickadd):
+            number = max(1, 20000 // words)
+            seconds = timeit.timeit(lambda: fn(quick, regexes), number=number)
+            print("  %-26s %10.2f us" % (fn.__name__, seconds / number * 1e6))
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testapp.settings")
+    sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+    import django
+
+    django.setup()
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for the ``towel.quick`` mappers with a realistic set of
+search form quick rules. Compares ``due_mapper`` and
+``model_choices_mapper`` using precomputed tables with the previous
+implementations which built their tables on every call::
+
+    cd tests
+    ./benchmark_quick_mappers.py
+"""
+
+import os
+import re
+import sys
+import timeit
+from os.path import abspath, dirname
+
+
+def rebuilding_model_choices_mapper(data, attribute):
+    from django.utils.encoding import force_str
+
+    def _fn(values):
+        reverse = {force_str(value): key for key, value in data}
+        try:
+            return {attribute: reverse[values["value"]]}
+        except KeyError:
+            return {}
+
+    return _fn
+
+
+def rebuilding_due_mapper(attribute):
+    from datetime import date, timedelta
+
+    from django.utils import dateformat
+    from django.utils.translation import gettext as _
+
+    def _fn(values):
+        today = date.today()
+        due = values["due"]
+
+        days = [
+            (dateformat.format(d, "l"), d)
+            for d in [(today + timedelta(days=d)) for d in range(2, 7)]
+        ]
+        days.append((_("Today"), today))
+        days.append((_("Tomorrow"), today + timedelta(days=1)))
+        days = {k.lower(): value for k, value in days}
+
+        if due.lower() in days:
+            return {attribute: days[due.lower()]}
+
+        day = [today.year, today.month, today.day]
+        try:
+            for i, n in enumerate(due.split(".")):
+                day[2 - i] = int(n, 10)
+        except (IndexError, TypeError, ValueError):
+            pass
+
+        try:
+            return {attribute: date(*day)}
+        except (TypeError, ValueError):
+            pass
+
+        return {}
+
+    return _fn
+
+
+def rules(due_mapper, model_choices_mapper):
+    from testapp.models import Person
+
+    from towel import quick
+
+    return [
+        (re.compile(r"!!"), quick.static(important=True)),
+        (re.compile(r"\^(?P<due>[^\s]+)"), due_mapper("due")),
+        (re.compile(r"=(?P<estimated_hours>[\d\.]+)h"), quick.identity()),
+        (re.compile(r"is:(?P<bool>\w+)"), quick.bool_mapper("is_active")),
+        (
+            re.compile(r"relationship:\((?P<value>[^\)]*)\)"),
+            model_choices_mapper(Person.RELATIONSHIP_CHOICES, "relationship"),
+        ),
+    ]
+
+
+def main():
+    from django.utils import translation
+
+    from towel import quick
+    from towel.quick import parse_quickadd
+
+    quick_string = "^Friday relationship:(married) !! is:yes =2h call back"
+    rule_sets = [
+        ("rebuilding", rules(rebuilding_due_mapper, rebuilding_model_choices_mapper)),
+        ("precomputed", rules(quick.due_mapper, quick.model_choices_mapper)),
+    ]
+
+    for language in ("en", "de"):
+        print("Language %s" % language)
+        with translation.override(language):
+            rebuilding, precomputed = (
+                parse_quickadd(quick_string, regexes) for name, regexes in rule_sets
+            )
+            assert rebuilding == precomputed
+
+            for name, regexes in rule_sets:
+                number = 20000
+                seconds = timeit.timeit(
+                    lambda: parse_quickadd(quick_string, regexes), number=number
+                )
+                print("  %-12s %10.2f us" % (name, seconds / number * 1e6))
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testapp.settings")
+    sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+    import django
+
+    django.setup()
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for building ``SearchManager._search`` querysets with wide
+``search_fields`` tuples, with and without the compiled query cache::
+
+    cd tests
+    ./benchmark_search.py
+"""
+
+import os
+import sys
+import timeit
+from os.path import abspath, dirname
+from unittest.mock import patch
+
+
+FIELDS = (
+    "family_name",
+    "given_name",
+    "relationship",
+    "emailaddress__email",
+    "groups__name",
+)
+QUERY = '+muster "hans peter" -example beispiel'
+
+
+def main():
+    from testapp.models import Person
+
+    from towel.managers import SearchCache
+
+    for width in (5, 20, 50):
+        fields = (FIELDS * width)[:width]
+        print("%s search fields" % width)
+
+        for name, cache in (("uncached", None), ("cached", SearchCache())):
+            with patch.object(Person.objects, "search_cache", cache):
+                number = 200
+                seconds = timeit.timeit(
+                    lambda: Person.objects._search(QUERY, fields=fields),
+                    number=number,
+                )
+            print("  %-10s %10.1f us" % (name, seconds / number * 1e6))
+            if cache is not None:
+                print("  %-10s %s" % ("", cache.info()))
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testapp.settings")
+    sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+    import django
+
+    django.setup()
+    main()
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.utils.timezone import now
 
@@ -102,3 +104,17 @@ class Resource(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class TagManager(SearchManager):
+    search_fields = ("name",)
+
+
+class Tag(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    name = models.CharField(max_length=100)
+
+    objects = TagManager()
+
+    def __str__(self):
+        return self.name
@@ -16,6 +16,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "testapp",
     "towel",
+    "towel.trigram",
 ]
 
 MEDIA_ROOT = "/media/"
@@ -1,10 +1,16 @@
 from datetime import timedelta
+from types import SimpleNamespace
 
-from django.test import TestCase
+from django.core import signing
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
 from django.urls import reverse
 from django.utils import timezone
 from testapp.models import Message, Person
 
+from towel.forms import BatchForm
+from towel.paginator import KeysetPaginator
+
 
 class FormsTest(TestCase):
     def test_warningsform(self):
@@ -161,5 +167,119 @@ class FormsTest(TestCase):
         # TODO multiple choice fields
         # TODO SearchForm.default
 
+    def test_batchform(self):
+        people = [Person.objects.create(family_name="Family %s" % i) for i in range(5)]
+        other = Person.objects.create(family_name="Other")
+        queryset = Person.objects.filter(family_name__startswith="Family")
+
+        request = RequestFactory().post(
+            "/",
+            {
+                "batchform": 1,
+                "batch_%s" % people[1].pk: people[1].pk,
+                "batch_%s" % people[3].pk: people[3].pk,
+                "batch_%s" % other.pk: other.pk,
+                "batch_%s" % people[4].pk: "",
+                "batch_abc": 1,
+            },
+        )
+        form = BatchForm(request, queryset)
+        with self.assertNumQueries(1):
+            self.assertTrue(form.should_process())
+        self.assertEqual(form.ids, {people[1].pk, people[3].pk})
+        self.assertEqual(list(form.batch_queryset), [people[1], people[3]])
+
+        html = Template(
+            "{% load towel_batch_tags %}{% batch_checkbox form id1 %}"
+            "{% batch_checkbox form id2 %}"
+        ).render(Context({"form": form, "id1": people[1].pk, "id2": other.pk}))
+        self.assertEqual(html.count('checked="checked"'), 1)
+        self.assertEqual(html.count("<input"), 2)
+
+        request = RequestFactory().post("/", {"batchform": 1, "batch_abc": 1})
+        form = BatchForm(request, queryset)
+        with self.assertNumQueries(0):
+            self.assertFalse(form.should_process())
+        self.assertEqual(form.errors["__all__"], ["No items selected"])
+
+    def test_batchform_select_all(self):
+        people = [Person.objects.create(family_name="Family %s" % i) for i in range(5)]
+        Person.objects.create(family_name="Other")
+        queryset = Person.objects.filter(family_name__startswith="Family")
+
+        def form(criteria, sign=True):
+            if sign:
+                criteria = signing.dumps(criteria, salt=BatchForm.criteria_salt)
+            request = RequestFactory().post(
+                "/",
+                {"batchform": 1, "batchform_all": 1, "batchform_criteria": criteria},
+            )
+            form = BatchForm(request, queryset)
+            form.criteria = "query=family"
+            return form
+
+        batch_form = form("query=other")
+        self.assertFalse(batch_form.should_process())
+        self.assertIn("The search criteria have changed", str(batch_form.errors))
+
+        # Unsigned criteria are rejected
+        batch_form = form("query=family", sign=False)
+        self.assertFalse(batch_form.should_process())
+        self.assertIn("The search criteria have changed", str(batch_form.errors))
+
+        batch_form = form("query=family")
+        self.assertTrue(batch_form.should_process())
+        self.assertTrue(batch_form.select_all)
+        self.assertEqual(batch_form.selected_count, 5)
+        self.assertEqual(batch_form.batch_queryset.count(), 5)
+
+        with self.assertLogs("towel.forms", "INFO"):
+            chunks = [list(chunk) for chunk in batch_form.batch_chunks(chunk_size=2)]
+        self.assertEqual(chunks, [people[:2], people[2:4], people[4:]])
+        self.assertEqual(batch_form.progress, {"processed": 5, "total": 5, "chunks": 3})
+        self.assertEqual(batch_form.processed_count(queryset), 5)
+
+        html = Template(
+            "{% load towel_batch_tags %}{% batch_select_all form %}"
+        ).render(Context({"form": batch_form}))
+        self.assertIn("Select all matching items", html)
+        self.assertIn('checked="checked"', html)
+        self.assertIn('value="%s"' % batch_form.signed_criteria, html)
+        self.assertEqual(
+            signing.loads(batch_form.signed_criteria, salt=BatchForm.criteria_salt),
+            "query=family",
+        )
+
+        # Counts of paginators
+        template = Template(
+            "{% load towel_batch_tags %}{% batch_select_all form paginator %}"
+        )
+        for paginator, label in [
+            (SimpleNamespace(count=1000, count_approximation=None), "1000"),
+            (SimpleNamespace(count=1000, count_approximation="capped"), "1000+"),
+            (SimpleNamespace(count=1000, count_approximation="estimated"), "~1000"),
+        ]:
+            html = template.render(
+                Context({"form": batch_form, "paginator": paginator})
+            )
+            self.assertIn("Select all %s matching items" % label, html)
+
+        # Keyset paginators do not count
+        with self.assertNumQueries(0):
+            html = template.render(
+                Context(
+                    {
+                        "form": batch_form,
+                        "paginator": KeysetPaginator(Person.objects.all(), 5),
+                    }
+                )
+            )
+        self.assertIn("Select all matching items", html)
+
+        # The selection has been counted before processing
+        batch_form.progress = None
+        queryset.update(family_name="Processed")
+        self.assertEqual(batch_form.processed_count(batch_form.batch_queryset), 5)
+
 
 # TODO autocompletion widget tests?
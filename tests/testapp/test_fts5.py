@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from testapp.models import Person
+
+from towel.fts5 import FTS5Index, FTS5SearchBackend, match_expression
+
+
+class FTS5IndexTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.index = FTS5Index(path=os.path.join(directory.name, "search.sqlite3"))
+        self.index.register(Person, Person.objects.search_fields)
+        self.addCleanup(self.index.unregister, Person)
+
+        patcher = patch.object(
+            Person.objects, "search_backend", FTS5SearchBackend(self.index)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for family_name, given_name in [
+                ("Muster", "Hans"),
+                ("Muster", "Hans Peter"),
+                ("Beispiel", "Peter"),
+                ("Example", "John"),
+            ]:
+                Person.objects.create(family_name=family_name, given_name=given_name)
+
+    def search(self, query):
+        return sorted(str(obj) for obj in Person.objects.search(query))
+
+    def test_lazy_tables(self):
+        path = os.path.join(os.path.dirname(self.index.path), "lazy.sqlite3")
+        index = FTS5Index(path=path)
+        with self.assertNumQueries(0):
+            index.register(Person, Person.objects.search_fields)
+        self.addCleanup(index.unregister, Person)
+        self.assertFalse(os.path.exists(path))
+
+        # The table is created when using the index
+        self.assertEqual(index.search(Person, ["muster"]), [])
+        connection = sqlite3.connect(path)
+        self.addCleanup(connection.close)
+        self.assertEqual(
+            connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+                " AND name = 'towel_fts5_testapp_person'"
+            ).fetchall(),
+            [("towel_fts5_testapp_person",)],
+        )
+
+    def test_match_expression(self):
+        self.assertEqual(
+            match_expression(["a", 'say "hi" OR']),
+            '"a" AND "say ""hi"" OR"',
+        )
+
+    def test_search(self):
+        self.assertEqual(self.search("muster"), ["Hans Muster", "Hans Peter Muster"])
+        self.assertEqual(self.search("ter -mus"), ["Peter Beispiel"])
+        self.assertEqual(self.search('"s pe"'), ["Hans Peter Muster"])
+        self.assertEqual(self.search('ex "OR"'), [])
+        self.assertEqual(self.search("ex"), ["John Example"])
+
+        # The index is asked first, the main database only gets candidates
+        self.assertEqual(
+            sorted(self.index.search(Person, ["muster"])),
+            sorted(
+                str(pk)
+                for pk in Person.objects.filter(family_name="Muster").values_list(
+                    "pk", flat=True
+                )
+            ),
+        )
+        self.assertIsNone(self.index.search(Person, ["muster"], limit=1))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.search("john"), ["John Example"])
+
+    def test_signals(self):
+        person = Person.objects.get(given_name="John")
+        with self.captureOnCommitCallbacks(execute=True):
+            person.family_name = "Changed"
+            person.save()
+        self.assertEqual(self.search("example"), [])
+        self.assertEqual(self.search("changed"), ["John Changed"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            person.delete()
+        self.assertEqual(self.index.search(Person, ["changed"]), [])
+
+    def test_check_and_rebuild(self):
+        self.assertEqual(self.index.check(Person), (set(), set()))
+
+        # Bypass the signals
+        Person.objects.filter(given_name="John").update(family_name="Changed")
+        Person.objects.filter(given_name="Hans").delete()
+        missing = Person.objects.create(family_name="Missing")
+        self.assertEqual(self.index.check(Person)[0], {str(missing.pk)})
+        self.assertEqual(len(self.index.check(Person)[1]), 1)
+        self.assertEqual(
+            self.index.check(Person, chunk_size=2), self.index.check(Person)
+        )
+
+        # Primary keys are fetched in chunks
+        with self.assertNumQueries(3):
+            self.index.check(Person, chunk_size=2)
+
+        stdout = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("fts5_index", "testapp.Person", stdout=stdout)
+        self.assertEqual(stdout.getvalue(), "testapp.Person: 1 missing, 1 stale\n")
+
+        with self.assertNumQueries(5):
+            call_command("fts5_index", rebuild=True, chunk_size=2, stdout=stdout)
+        self.assertIn("testapp.Person: Indexed 4 objects", stdout.getvalue())
+        self.assertEqual(self.index.check(Person), (set(), set()))
+        call_command("fts5_index", stdout=StringIO())
+        self.assertEqual(self.search("changed"), ["John Changed"])
+        self.assertEqual(self.search("missing"), [" Missing"])
+
+        with self.assertRaises(CommandError):
+            call_command("fts5_index", "testapp.EmailAddress")
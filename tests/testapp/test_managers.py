@@ -0,0 +1,218 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from testapp.models import EmailAddress, Person
+
+from towel.managers import (
+    IContainsSearchBackend,
+    PostgreSQLSearchBackend,
+    SearchCache,
+    SlowSearchRecorder,
+    parse_query,
+)
+
+
+class SearchManagerTest(TestCase):
+    def setUp(self):
+        for family_name, given_name in [
+            ("Muster", "Hans"),
+            ("Muster", "Hans Peter"),
+            ("Beispiel", "Peter"),
+            ("Example", "John"),
+        ]:
+            person = Person.objects.create(
+                family_name=family_name, given_name=given_name
+            )
+            EmailAddress.objects.create(
+                person=person, email="%s@example.com" % given_name.split()[0]
+            )
+
+    def search(self, query, manager=Person.objects):
+        return sorted(str(obj) for obj in manager.search(query))
+
+    def test_parse_query(self):
+        self.assertEqual(
+            parse_query(' +django  "shop   software" -satchmo - + -'),
+            [
+                ("django", False),
+                ("shop software", False),
+                ("satchmo", True),
+                ("-", False),
+                ("+", False),
+                ("-", False),
+            ],
+        )
+
+    def test_search(self):
+        self.assertEqual(self.search(""), self.search("   "))
+        self.assertEqual(self.search("muster"), ["Hans Muster", "Hans Peter Muster"])
+        self.assertEqual(self.search("+peter"), ["Hans Peter Muster", "Peter Beispiel"])
+        self.assertEqual(self.search("peter -muster"), ["Peter Beispiel"])
+        self.assertEqual(self.search('"hans peter"'), ["Hans Peter Muster"])
+        self.assertEqual(self.search('"peter hans"'), [])
+        self.assertEqual(self.search("-muster"), ["John Example", "Peter Beispiel"])
+        self.assertEqual(
+            self.search("john@", EmailAddress.objects), ["John@example.com"]
+        )
+        self.assertEqual(
+            self.search("beispiel", EmailAddress.objects), ["Peter@example.com"]
+        )
+
+    def test_backends(self):
+        calls = []
+
+        class RecordingBackend(IContainsSearchBackend):
+            def compile(self, queryset, terms, fields):
+                calls.append((terms, fields))
+                return super().compile(queryset, terms, fields)
+
+        with patch.object(Person.objects, "search_backend", RecordingBackend()):
+            self.assertEqual(self.search("hans -peter"), ["Hans Muster"])
+        self.assertEqual(
+            calls, [([("hans", False), ("peter", True)], ("family_name", "given_name"))]
+        )
+
+        # Other databases than PostgreSQL fall back to icontains lookups
+        with patch.object(
+            Person.objects, "search_backend", PostgreSQLSearchBackend("english")
+        ):
+            self.assertEqual(self.search("mus -pet"), ["Hans Muster"])
+
+    def test_ranking(self):
+        Person.objects.create(family_name="Petersen", given_name="Anna")
+        Person.objects.create(family_name="Schmid", given_name="Peter")
+
+        # given_name (exact) and family_name (prefix) beat substrings
+        self.assertEqual(
+            [str(p) for p in Person.objects._search("peter", rank=True)],
+            [
+                "Anna Petersen",
+                "Peter Beispiel",
+                "Peter Schmid",
+                "Hans Peter Muster",
+            ],
+        )
+        self.assertEqual(
+            [p.search_rank for p in Person.objects._search("peter", rank=True)],
+            [4, 3, 3, 1],
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                [str(p) for p in Person.objects.search("peter -schmid", limit=2)],
+                ["Anna Petersen", "Peter Beispiel"],
+            )
+
+        # Custom field weights
+        with patch.object(Person.objects, "search_field_weights", {"given_name": 10}):
+            self.assertEqual(
+                [str(p) for p in Person.objects.search("pet hans", limit=5)],
+                ["Hans Peter Muster"],
+            )
+            self.assertEqual(
+                [str(p) for p in Person.objects.search("peter", limit=3)],
+                ["Peter Beispiel", "Peter Schmid", "Hans Peter Muster"],
+            )
+
+        self.assertEqual(len(Person.objects.search("", limit=3)), 3)
+
+    def test_related_fields(self):
+        hans = Person.objects.get(given_name="Hans")
+        EmailAddress.objects.create(person=hans, email="hans.muster@example.org")
+
+        fields = ("family_name", "emailaddress__email")
+        queryset = Person.objects._search("hans", fields=fields)
+        self.assertEqual(
+            [str(p) for p in queryset], ["Hans Muster", "Hans Peter Muster"]
+        )
+        self.assertEqual(queryset.count(), 2)
+
+        sql = str(queryset.query).upper()
+        self.assertIn("EXISTS", sql)
+        self.assertNotIn("JOIN", sql.split("EXISTS")[0])
+
+        self.assertEqual(
+            [str(p) for p in Person.objects._search("-example.org", fields=fields)],
+            ["Peter Beispiel", "John Example", "Hans Peter Muster"],
+        )
+        self.assertEqual(
+            [
+                str(p)
+                for p in Person.objects._search("example.org", fields=fields, rank=True)
+            ],
+            ["Hans Muster"],
+        )
+
+    def test_search_cache(self):
+        cache = SearchCache(maxsize=2)
+        with patch.object(Person.objects, "search_cache", cache):
+            self.assertEqual(self.search("peter -hans"), ["Peter Beispiel"])
+            self.assertEqual(self.search(" peter   -hans "), ["Peter Beispiel"])
+            self.assertEqual(
+                self.search("muster"), ["Hans Muster", "Hans Peter Muster"]
+            )
+            self.assertEqual(
+                Person.objects._search("muster", fields=("given_name",)).count(), 0
+            )
+            self.assertEqual(
+                cache.info(), {"hits": 1, "misses": 3, "size": 2, "maxsize": 2}
+            )
+
+            # The least recently used entry has been evicted
+            self.search("muster")
+            self.search("peter -hans")
+            self.assertEqual(cache.info()["hits"], 2)
+            self.assertEqual(cache.info()["misses"], 4)
+
+            # Compiled conditions are reused across querysets
+            self.assertEqual(
+                sorted(
+                    str(p)
+                    for p in Person.objects._search(
+                        "muster", queryset=Person.objects.filter(given_name="Hans")
+                    )
+                ),
+                ["Hans Muster"],
+            )
+            self.assertEqual(cache.info()["hits"], 3)
+
+            cache.clear()
+            self.assertEqual(cache.info()["size"], 0)
+
+        with patch.object(Person.objects, "search_cache", None):
+            self.assertEqual(self.search("peter -hans"), ["Peter Beispiel"])
+
+    def test_slow_search_recorder(self):
+        entries = []
+        recorder = SlowSearchRecorder(threshold=0, sink=entries.append)
+        with patch.object(Person.objects, "search_recorder", recorder):
+            queryset = Person.objects.search('"hans peter" -beispiel')
+            self.assertEqual(entries, [])
+
+            self.assertEqual(queryset.filter(is_active=True).count(), 1)
+            self.assertEqual(len(queryset), 1)
+            self.assertEqual(len(queryset), 1)  # Cached, no second entry
+
+        self.assertEqual(
+            [(e["operation"], e["query"], e["terms"]) for e in entries],
+            [
+                ("count", '"hans peter" -beispiel', "hans peter -beispiel"),
+                ("fetch", '"hans peter" -beispiel', "hans peter -beispiel"),
+            ],
+        )
+        self.assertIn("is_active", entries[0]["sql"])
+        self.assertIn("LIKE", entries[1]["sql"])
+        self.assertGreaterEqual(entries[1]["elapsed"], 0)
+        self.assertTrue(entries[1]["explain"])
+        self.assertEqual(entries[1]["model"], "testapp.Person")
+
+        recorder = SlowSearchRecorder(threshold=0, explain=False)
+        with patch.object(Person.objects, "search_recorder", recorder):
+            with self.assertLogs("towel.managers", "WARNING") as logs:
+                list(Person.objects.search("muster"))
+        self.assertIn("on testapp.Person: 'muster'", logs.output[0])
+
+        recorder = SlowSearchRecorder(threshold=60, sink=entries.append)
+        with patch.object(Person.objects, "search_recorder", recorder):
+            list(Person.objects.search("muster"))
+        self.assertEqual(len(entries), 2)
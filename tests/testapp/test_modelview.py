@@ -1,7 +1,18 @@
+import html
+import re
+from unittest.mock import patch
+
+from django.core import signing
+from django.template import Context, Template
 from django.test import TestCase
 from django.urls import reverse
 from django.utils.encoding import force_str
 from testapp.models import EmailAddress, Message, Person
+from testapp.views import person_views
+
+from towel import paginator
+from towel.forms import BatchForm
+from towel.modelview import StreamingObjectList
 
 
 class ModelViewTest(TestCase):
@@ -23,6 +34,65 @@ class ModelViewTest(TestCase):
         self.assertEqual(self.client.get("/persons/0/").status_code, 404)
         self.assertEqual(self.client.get("/persons/a/").status_code, 404)
 
+    def test_show_all(self):
+        for i in range(7):
+            Person.objects.create(family_name="Family %r" % i)
+
+        with patch.object(person_views, "pagination_all_chunk_size", 2):
+            response = self.client.get("/persons/?all=1")
+            self.assertTrue(response.streaming)
+            chunks = [force_str(chunk) for chunk in response.streaming_content]
+
+        self.assertEqual(len(chunks), 6)  # Head, 4 chunks of rows, tail
+        self.assertEqual(
+            [chunk.count('name="batch_') for chunk in chunks[1:-1]], [2, 2, 2, 1]
+        )
+        self.assertIn("</thead>", chunks[0])
+        self.assertIn("</html>", chunks[-1])
+        self.assertNotIn("towel-stream-", "".join(chunks))
+
+        with patch.object(person_views, "pagination_all_limit", 3):
+            response = self.client.get("/persons/?all=1")
+            content = force_str(b"".join(response.streaming_content))
+
+        self.assertEqual(content.count('name="batch_'), 3)
+        self.assertEqual(content.count("<span>1 - 3 / 7</span>"), 2)
+        self.assertIn("Please refine your search.", content)
+
+    def test_streaming_object_list(self):
+        for i in range(3):
+            Person.objects.create(family_name="Family %r" % i)
+
+        template = Template(
+            "{% if object_list %}{{ object_list|length }} {{ object_list.count }}"
+            "{% else %}empty{% endif %}"
+        )
+        object_list = StreamingObjectList(Person.objects.all(), 2, 3)
+        self.assertEqual(template.render(Context({"object_list": object_list})), "3 3")
+        self.assertEqual(len(list(object_list)), 3)
+
+        object_list = StreamingObjectList(Person.objects.none(), 2, 0)
+        self.assertEqual(
+            template.render(Context({"object_list": object_list})), "empty"
+        )
+
+    def test_keyset_show_all(self):
+        for i in range(7):
+            Person.objects.create(family_name="Family %r" % i)
+
+        with patch.object(person_views, "paginator_class", paginator.KeysetPaginator):
+            response = self.client.get("/persons/")
+            self.assertContains(response, 'name="batch_', 5)
+            self.assertContains(response, "&after=")
+
+            response = self.client.get("/persons/?all=1")
+            content = force_str(b"".join(response.streaming_content))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content.count('name="batch_'), 7)
+        self.assertNotIn("&after=", content)
+        self.assertNotIn("&before=", content)
+
     def test_crud(self):
         self.assertContains(self.client.get("/persons/add/"), "<form", 1)
         self.assertEqual(
@@ -274,7 +344,11 @@ class ModelViewTest(TestCase):
         }
         for pk in Person.objects.values_list("id", flat=True)[:3]:
             data["batch_%s" % pk] = pk
-        response = self.client.post("/persons/", data, follow=True)
+
+        # Invalid and unknown ids are ignored
+        response = self.client.post(
+            "/persons/", dict(data, batch_abc=1, batch_99999=1, batch_=1), follow=True
+        )
         self.assertRedirects(response, "/persons/")
 
         messages = [str(m) for m in response.context["messages"]]
@@ -285,6 +359,90 @@ class ModelViewTest(TestCase):
         self.assertTrue("Given 10 Family 10" in messages)
         self.assertEqual(Person.objects.filter(is_active=False).count(), 3)
 
+    def test_batchform_select_all(self):
+        for i in range(12):
+            Person.objects.create(family_name="Family %s" % (i % 3))
+
+        response = self.client.get("/persons/?query=family+1&s=1")
+        self.assertContains(response, "Select all 4 matching items")
+        criteria = re.search(
+            r'name="batchform_criteria" value="([^"]*)"', force_str(response.content)
+        ).group(1)
+        criteria = html.unescape(criteria)
+        self.assertEqual(
+            signing.loads(criteria, salt=BatchForm.criteria_salt), "query=family+1"
+        )
+
+        # The search is stored in the session, the criteria are posted
+        response = self.client.post(
+            "/persons/",
+            {
+                "batchform": 1,
+                "batchform_all": 1,
+                "batchform_criteria": criteria,
+                "batch-is_active": 3,
+            },
+            follow=True,
+        )
+        self.assertRedirects(response, "/persons/")
+        messages = [str(m) for m in response.context["messages"]]
+        self.assertEqual(messages, ["4 have been updated.", "Processed 4 items."])
+        self.assertEqual(
+            set(
+                Person.objects.filter(is_active=False).values_list(
+                    "family_name", flat=True
+                )
+            ),
+            {"Family 1"},
+        )
+
+        # Tampered with criteria are rejected
+        response = self.client.post(
+            "/persons/",
+            {
+                "batchform": 1,
+                "batchform_all": 1,
+                "batchform_criteria": "query=family",
+                "batch-is_active": 3,
+            },
+        )
+        self.assertContains(response, "The search criteria have changed")
+        self.assertEqual(Person.objects.filter(is_active=False).count(), 4)
+
+        # The selection is counted before processing changes whether the
+        # items match
+        response = self.client.get("/persons/?is_active=2&s=1")
+        self.assertContains(response, "Select all 8 matching items")
+        criteria = re.search(
+            r'name="batchform_criteria" value="([^"]*)"', force_str(response.content)
+        ).group(1)
+        response = self.client.post(
+            "/persons/",
+            {
+                "batchform": 1,
+                "batchform_all": 1,
+                "batchform_criteria": html.unescape(criteria),
+                "batch-is_active": 3,
+            },
+            follow=True,
+        )
+        messages = [str(m) for m in response.context["messages"]]
+        self.assertEqual(messages, ["8 have been updated.", "Processed 8 items."])
+        self.assertEqual(Person.objects.filter(is_active=False).count(), 12)
+
+        # No criteria, all items
+        response = self.client.post(
+            "/persons/",
+            {
+                "batchform": 1,
+                "batchform_all": 1,
+                "batchform_criteria": signing.dumps("", salt=BatchForm.criteria_salt),
+                "batch-is_active": 2,
+            },
+            follow=True,
+        )
+        self.assertEqual(Person.objects.filter(is_active=True).count(), 12)
+
     def test_automatic_get_absolute_url(self):
         self.client.get("/messages/")
 
@@ -0,0 +1,375 @@
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+from testapp.models import Group, Person
+
+from towel.modelview import ModelView
+from towel.paginator import (
+    PAGINATION,
+    CachedCount,
+    CappedCount,
+    CountlessPaginator,
+    EmptyPage,
+    EstimatedCount,
+    KeysetPaginator,
+    Paginator,
+    SnapshotPaginator,
+    WindowCountPaginator,
+    filter_adjacent,
+)
+
+
+class KeysetPaginatorTest(TestCase):
+    def setUp(self):
+        for i in range(23):
+            Person.objects.create(
+                family_name="Family %s" % (i % 4),
+                given_name="Given %02d" % i,
+                is_active=bool(i % 3),
+            )
+
+    def walk(self, queryset, per_page=5):
+        paginator = KeysetPaginator(queryset, per_page)
+        page = paginator.keyset_page()
+        self.assertFalse(page.has_previous())
+        pages = [page]
+        while page.has_next():
+            page = paginator.keyset_page(after=page.next_cursor)
+            pages.append(page)
+            self.assertLess(len(pages), 100, "Endless pagination")
+
+        backwards = [page]
+        while page.has_previous():
+            page = paginator.keyset_page(before=page.previous_cursor)
+            backwards.append(page)
+
+        self.assertEqual(
+            [list(p) for p in pages],
+            [list(p) for p in reversed(backwards)],
+        )
+        return [item for page in pages for item in page]
+
+    def test_walk(self):
+        for queryset in [
+            Person.objects.all(),
+            Person.objects.order_by("-is_active", "family_name"),
+            Person.objects.order_by("family_name").reverse(),
+            Person.objects.order_by("-created", "-pk"),
+        ]:
+            self.assertEqual(self.walk(queryset), list(queryset))
+            self.assertEqual(self.walk(queryset, per_page=23), list(queryset))
+
+    def test_walk_nulls(self):
+        group_a = Group.objects.create(name="A")
+        group_b = Group.objects.create(name="B")
+        for i, person in enumerate(Person.objects.all()):
+            if i % 3 == 0:
+                person.groups.add(group_a)
+            if i % 4 == 0:
+                person.groups.add(group_b)
+
+        for ordering in [
+            ("groups__name", "family_name"),
+            ("-groups__name", "-family_name"),
+        ]:
+            queryset = Person.objects.order_by(*ordering)
+            expected = Person.objects.order_by(
+                (
+                    F("groups__name").desc(nulls_first=True)
+                    if ordering[0].startswith("-")
+                    else F("groups__name").asc(nulls_last=True)
+                ),
+                ordering[1],
+                "pk",
+            )
+            self.assertEqual(self.walk(queryset), list(expected))
+            self.assertEqual(self.walk(queryset, per_page=3), list(expected))
+
+        paginator = KeysetPaginator(
+            Person.objects.order_by(F("groups__name").asc(nulls_first=True)), 5
+        )
+        self.assertRaises(ImproperlyConfigured, paginator.keyset_page)
+
+    def test_invalid_cursors(self):
+        paginator = KeysetPaginator(Person.objects.all(), 5)
+        first = list(paginator.keyset_page())
+        cursor = paginator.keyset_page().next_cursor
+
+        self.assertEqual(list(paginator.keyset_page(after="abc")), first)
+        self.assertEqual(list(paginator.keyset_page(after=cursor + "x")), first)
+        self.assertNotEqual(list(paginator.keyset_page(after=cursor)), first)
+
+        # Cursors are bound to the ordering
+        other = KeysetPaginator(Person.objects.order_by("given_name"), 5)
+        self.assertEqual(
+            list(other.keyset_page(after=cursor)),
+            list(Person.objects.order_by("given_name")[:5]),
+        )
+
+        paginator = KeysetPaginator(Person.objects.order_by("?"), 5)
+        self.assertRaises(ImproperlyConfigured, paginator.keyset_page)
+
+    def test_template(self):
+        request = RequestFactory().get("/?query=x&page=3&after=abc")
+        paginator = KeysetPaginator(Person.objects.all(), 5)
+        page = paginator.page_for_request(request)
+
+        html = Template(
+            "{% load towel_resources %}{% pagination page paginator %}"
+        ).render(Context({"request": request, "page": page, "paginator": paginator}))
+        self.assertIn("?query=x&after=", html)
+        self.assertNotIn("before=", html)
+        self.assertNotIn("page=", html)
+
+
+class CountStrategyTest(TestCase):
+    def setUp(self):
+        for i in range(30):
+            Person.objects.create(family_name="Family %s" % i)
+
+    def test_strategies(self):
+        queryset = Person.objects.all()
+
+        paginator = Paginator(queryset, 5)
+        self.assertEqual(paginator.count, 30)
+        self.assertEqual(paginator.count_approximation, None)
+
+        paginator = Paginator(queryset, 5, count_strategy=CappedCount(20))
+        self.assertEqual(paginator.count, 20)
+        self.assertEqual(paginator.count_approximation, "capped")
+        self.assertEqual(paginator.num_pages, 4)
+        paginator = Paginator(queryset, 5, count_strategy=CappedCount(30))
+        self.assertEqual(paginator.count, 30)
+        self.assertEqual(paginator.count_approximation, None)
+
+        # No planner estimates on SQLite
+        paginator = Paginator(queryset, 5, count_strategy=EstimatedCount(0))
+        self.assertEqual(paginator.count, 30)
+        self.assertEqual(paginator.count_approximation, None)
+
+        strategy = CachedCount()
+        self.assertEqual(Paginator(queryset, 5, count_strategy=strategy).count, 30)
+        Person.objects.create()
+        with self.assertNumQueries(0):
+            self.assertEqual(Paginator(queryset, 5, count_strategy=strategy).count, 30)
+        self.assertEqual(
+            Paginator(queryset.filter(pk__in=[]), 5, count_strategy=strategy).count,
+            0,
+        )
+        self.assertEqual(
+            Paginator(list(queryset), 5, count_strategy=strategy).count, 31
+        )
+
+    def test_template(self):
+        request = RequestFactory().get("/")
+        paginator = Paginator(Person.objects.all(), 5, count_strategy=CappedCount(20))
+        html = Template(
+            "{% load towel_resources %}{% pagination page paginator %}"
+        ).render(
+            Context(
+                {
+                    "request": request,
+                    "page": paginator.page_for_request(request),
+                    "paginator": paginator,
+                }
+            )
+        )
+        self.assertIn("<span>1 - 5 / 20+</span>", html)
+
+
+class PageRangeTest(TestCase):
+    def test_page_range(self):
+        def reference(number, num_pages, start, around, end):
+            return list(
+                filter_adjacent(
+                    (
+                        i
+                        if i <= start
+                        or i > num_pages - end
+                        or abs(number - i) <= around
+                        else None
+                    )
+                    for i in range(1, num_pages + 1)
+                )
+            )
+
+        for config in [(6, 5, 6), (0, 0, 0), (1, 2, 20), (20, 1, 0)]:
+            with patch.dict(PAGINATION, dict(zip(("START", "AROUND", "END"), config))):
+                for num_pages in range(1, 40):
+                    paginator = Paginator(range(num_pages), 1)
+                    for number in range(1, num_pages + 1):
+                        self.assertEqual(
+                            paginator.page(number).page_range,
+                            reference(number, num_pages, *config),
+                        )
+
+    def test_huge_page_range(self):
+        page = Paginator(range(5000000), 10).page(250000)
+        self.assertEqual(
+            page.page_range,
+            [1, 2, 3, 4, 5, 6, None]
+            + list(range(249995, 250006))
+            + [None, 499995, 499996, 499997, 499998, 499999, 500000],
+        )
+        self.assertIs(page.page_range, page.page_range)
+
+
+class CountlessPaginatorTest(TestCase):
+    def test_countless(self):
+        for i in range(12):
+            Person.objects.create(family_name="Family %02d" % i)
+
+        view = ModelView(Person, paginator_class=CountlessPaginator)
+        factory = RequestFactory()
+
+        with self.assertNumQueries(1):
+            page, paginator = view.paginate_object_list(
+                factory.get("/?page=2"), Person.objects.all(), 5
+            )
+            self.assertEqual(len(page), 5)
+            self.assertTrue(page.has_previous())
+            self.assertTrue(page.has_next())
+            self.assertEqual((page.start_index(), page.end_index()), (6, 10))
+
+        page, paginator = view.paginate_object_list(
+            factory.get("/?page=3"), Person.objects.all(), 5
+        )
+        self.assertEqual(len(page), 2)
+        self.assertFalse(page.has_next())
+
+        page, paginator = view.paginate_object_list(
+            factory.get("/?page=abc"), Person.objects.all(), 5
+        )
+        self.assertEqual(page.number, 1)
+        self.assertEqual(len(paginator.page(42)), 0)
+
+        request = factory.get("/?page=2")
+        with self.assertNumQueries(1):
+            html = Template(
+                "{% load towel_resources %}{% pagination page paginator %}"
+            ).render(
+                Context(
+                    {
+                        "request": request,
+                        "page": paginator.page_for_request(request),
+                        "paginator": paginator,
+                    }
+                )
+            )
+        self.assertIn('href="?&page=1"', html)
+        self.assertIn('href="?&page=3"', html)
+        self.assertIn("<span>6 - 10</span>", html)
+
+
+class WindowCountPaginatorTest(TestCase):
+    def test_window_count(self):
+        for i in range(12):
+            Person.objects.create(family_name="Family %02d" % i)
+
+        queryset = Person.objects.filter(family_name__startswith="Family")
+        request = RequestFactory().get("/?page=2")
+
+        with self.assertNumQueries(1):
+            paginator = WindowCountPaginator(queryset, 5)
+            page = paginator.page_for_request(request)
+            self.assertEqual(len(page), 5)
+            self.assertEqual(paginator.count, 12)
+            self.assertEqual(paginator.num_pages, 3)
+            self.assertEqual(list(page.page_range), [1, 2, 3])
+        self.assertEqual(list(page), list(queryset[5:10]))
+
+        # Orphans are added to the last page
+        paginator = WindowCountPaginator(queryset, 5, orphans=2)
+        self.assertEqual(len(paginator.page(2)), 7)
+        self.assertEqual(paginator.num_pages, 2)
+
+        # Pages after the last page are invalid even if they contain rows
+        paginator = WindowCountPaginator(queryset, 5, orphans=2)
+        self.assertRaises(EmptyPage, paginator.page, 3)
+        page = paginator.get_page(3)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page), 7)
+
+        # values() and values_list() rows cannot carry the count
+        with self.assertNumQueries(2):
+            paginator = WindowCountPaginator(queryset.values("family_name"), 5)
+            page = paginator.page(3)
+            self.assertEqual(page[0], {"family_name": "Family 10"})
+            self.assertEqual(paginator.count, 12)
+        paginator = WindowCountPaginator(queryset.values_list("id", flat=True), 5)
+        self.assertEqual(len(paginator.page(3)), 2)
+
+        # Empty pages need a separate count
+        with self.assertNumQueries(3):
+            paginator = WindowCountPaginator(queryset, 5)
+            page = paginator.get_page(42)
+            self.assertEqual(page.number, 3)
+            self.assertEqual(len(page), 2)
+
+        paginator = WindowCountPaginator(queryset.none(), 5)
+        self.assertEqual(len(paginator.get_page(1)), 0)
+        self.assertEqual(paginator.count, 0)
+
+        # distinct() querysets are counted separately
+        with self.assertNumQueries(2):
+            paginator = WindowCountPaginator(queryset.distinct(), 5)
+            self.assertEqual(len(paginator.page(3)), 2)
+            self.assertEqual(paginator.count, 12)
+
+
+class SnapshotPaginatorTest(TestCase):
+    def test_snapshot(self):
+        for i in range(12):
+            Person.objects.create(family_name="Family %02d" % i)
+
+        queryset = Person.objects.filter(family_name__icontains="family")
+        factory = RequestFactory()
+
+        # The first page takes the snapshot
+        with self.assertNumQueries(2):
+            paginator = SnapshotPaginator(queryset, 5)
+            page = paginator.page_for_request(factory.get("/"))
+            self.assertEqual(paginator.count, 12)
+            self.assertEqual(len(page), 5)
+
+        Person.objects.create(family_name="Family 12")
+        Person.objects.filter(family_name="Family 06").delete()
+
+        # Later pages use the snapshot
+        with self.assertNumQueries(1):
+            paginator = SnapshotPaginator(queryset, 5)
+            page = paginator.page_for_request(factory.get("/?page=2"))
+            self.assertEqual(paginator.count, 12)
+            self.assertEqual(
+                [p.family_name for p in page],
+                ["Family 05", "Family 07", "Family 08", "Family 09"],
+            )
+
+        # Starting again refreshes the snapshot
+        paginator = SnapshotPaginator(queryset, 5)
+        paginator.page_for_request(factory.get("/?page=1"))
+        self.assertEqual(paginator.count, 12)
+        self.assertEqual(
+            list(paginator.page(3)), list(queryset.order_by("-family_name")[:2])[::-1]
+        )
+
+        # Too many objects, paginate as usual
+        paginator = SnapshotPaginator(queryset, 5)
+        paginator.snapshot_max_size = 10
+        paginator.refresh_snapshot = True
+        self.assertEqual(paginator.snapshot, None)
+        self.assertEqual(list(paginator.page(3)), list(queryset[10:]))
+
+        # Too big results are not fetched again when starting again
+        with self.assertNumQueries(2):
+            paginator = SnapshotPaginator(queryset, 5)
+            paginator.snapshot_max_size = 10
+            page = paginator.page_for_request(factory.get("/"))
+            self.assertEqual(paginator.snapshot, None)
+            self.assertEqual(paginator.count, 12)
+            self.assertEqual(len(page), 5)
+
+        self.assertEqual(SnapshotPaginator(queryset.none(), 5).count, 0)
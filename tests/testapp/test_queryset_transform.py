@@ -0,0 +1,305 @@
+import threading
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from testapp.models import EmailAddress, Person
+
+from towel.queryset_transform import (
+    DICTS,
+    INSTANCES,
+    TUPLES,
+    CachedTransform,
+    TransformStatsMiddleware,
+    collect_transform_stats,
+    depends_on,
+    row_shapes,
+    transform_executed,
+    transform_executor,
+    transform_waves,
+)
+
+
+class TransformQuerySetTest(TestCase):
+    def setUp(self):
+        for i in range(7):
+            Person.objects.create(family_name="Family %s" % i)
+
+    def test_iterator(self):
+        chunks = []
+
+        def record(items):
+            chunks.append(len(items))
+            for item in items:
+                item.transformed = True
+
+        queryset = Person.objects.transform(record)
+        self.assertTrue(all(item.transformed for item in queryset))
+        self.assertEqual(chunks, [7])
+
+        chunks.clear()
+        with self.assertNumQueries(1):
+            items = list(queryset.iterator(chunk_size=3))
+        self.assertEqual(chunks, [3, 3, 1])
+        self.assertEqual(items, list(Person.objects.all()))
+        self.assertTrue(all(item.transformed for item in items))
+
+        chunks.clear()
+        self.assertEqual(len(list(queryset.iterator())), 7)
+        self.assertEqual(chunks, [7])
+
+        # Chunks are transformed lazily
+        chunks.clear()
+        iterator = queryset.iterator(chunk_size=5)
+        self.assertEqual(chunks, [])
+        next(iterator)
+        self.assertEqual(chunks, [5])
+
+        # Other iterable classes are not transformed
+        chunks.clear()
+        self.assertEqual(len(list(queryset.values("id").iterator(chunk_size=3))), 7)
+        self.assertEqual(chunks, [])
+
+    def test_row_shapes(self):
+        @row_shapes(INSTANCES, DICTS)
+        def add_length(rows):
+            for row in rows:
+                if isinstance(row, dict):
+                    row["length"] = len(row["family_name"])
+                else:
+                    row.length = len(row.family_name)
+
+        @row_shapes(TUPLES)
+        def append_length(rows):
+            return [row + (len(row[-1]),) for row in rows]
+
+        def legacy(rows):
+            for row in rows:
+                row.legacy = True
+            return "ignored"
+
+        queryset = Person.objects.transform(add_length, append_length, legacy)
+
+        person = queryset[0]
+        self.assertEqual((person.length, person.legacy), (8, True))
+        self.assertEqual(
+            list(queryset.values("pk", "family_name")[:1]),
+            [{"pk": person.pk, "family_name": "Family 0", "length": 8}],
+        )
+        self.assertEqual(
+            list(queryset.values_list("pk", "family_name")[:1]),
+            [(person.pk, "Family 0", 8)],
+        )
+        self.assertEqual(
+            [
+                row[2]
+                for row in queryset.values_list("pk", "family_name").iterator(
+                    chunk_size=2
+                )
+            ],
+            [8] * 7,
+        )
+        self.assertEqual(
+            list(queryset.values_list("pk", flat=True)),
+            list(Person.objects.values_list("pk", flat=True)),
+        )
+
+        # Transforms run once, not on every evaluation
+        rows = queryset.values_list("family_name")
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(list(rows)[0], ("Family 0", 8))
+
+    def test_cached_transform(self):
+        cache.clear()
+        fetched = []
+
+        def fetch_emails(pks):
+            fetched.append(sorted(pks))
+            emails = {}
+            for person, email in EmailAddress.objects.filter(
+                person__in=pks
+            ).values_list("person", "email"):
+                emails.setdefault(person, []).append(email)
+            return emails
+
+        emails = CachedTransform("emails", fetch_emails, default=[])
+        receiver = emails.invalidate_on(
+            EmailAddress, related=lambda instance: [instance.person_id]
+        )
+        self.addCleanup(post_save.disconnect, receiver, sender=EmailAddress)
+        self.addCleanup(post_delete.disconnect, receiver, sender=EmailAddress)
+
+        first, second = Person.objects.all()[:2]
+        EmailAddress.objects.create(person=first, email="first@example.com")
+        pks = sorted(Person.objects.values_list("pk", flat=True))
+
+        people = list(Person.objects.transform(emails))
+        self.assertEqual(fetched, [pks])
+        self.assertEqual(people[0].emails, ["first@example.com"])
+        self.assertEqual(people[1].emails, [])
+
+        # Default values are not shared between instances
+        people[1].emails.append("mutated@example.com")
+        self.assertEqual(people[2].emails, [])
+        self.assertEqual(emails.default, [])
+
+        # Everything is cached now, including the default values
+        with self.assertNumQueries(1):
+            list(Person.objects.transform(emails))
+        self.assertEqual(len(fetched), 1)
+
+        # Saving and deleting related objects invalidates the cache
+        email = EmailAddress.objects.create(person=second, email="second@example.com")
+        people = list(Person.objects.transform(emails))
+        self.assertEqual(fetched[1:], [[second.pk]])
+        self.assertEqual(people[1].emails, ["second@example.com"])
+
+        email.delete()
+        self.assertEqual(list(Person.objects.transform(emails))[1].emails, [])
+        self.assertEqual(fetched[2:], [[second.pk]])
+
+    def test_concurrent_transforms_in_atomic_block(self):
+        threads = set()
+
+        def record(rows):
+            threads.add(threading.get_ident())
+
+        list(Person.objects.transform(record, record).concurrent_transforms())
+        self.assertEqual(threads, {threading.get_ident()})
+
+    def test_instrumentation(self):
+        def emails(rows):
+            EmailAddress.objects.filter(person__in=rows).count()
+            EmailAddress.objects.filter(person__in=rows).exists()
+
+        measurements = []
+
+        def receiver(sender, **kwargs):
+            measurements.append((sender, kwargs))
+
+        transform_executed.connect(receiver)
+        self.addCleanup(transform_executed.disconnect, receiver)
+
+        list(Person.objects.transform(emails).iterator(chunk_size=4))
+        self.assertEqual(len(measurements), 2)
+        sender, kwargs = measurements[0]
+        self.assertEqual(sender, Person)
+        self.assertEqual(
+            kwargs["name"],
+            "testapp.test_queryset_transform.TransformQuerySetTest"
+            ".test_instrumentation.<locals>.emails",
+        )
+        self.assertEqual((kwargs["rows"], kwargs["queries"]), (4, 2))
+        self.assertGreater(kwargs["duration"], 0)
+        self.assertEqual(measurements[1][1]["rows"], 3)
+
+        with collect_transform_stats() as stats:
+            list(Person.objects.transform(emails, CachedTransform("x", lambda pks: {})))
+        self.assertEqual(
+            {
+                name: (v["calls"], v["rows"], v["queries"])
+                for name, v in stats.transforms.items()
+            },
+            {
+                measurements[0][1]["name"]: (1, 7, 2),
+                "towel.queryset_transform.CachedTransform": (1, 7, 0),
+            },
+        )
+
+    def test_stats_middleware(self):
+        def view(request):
+            list(Person.objects.transform(lambda rows: None))
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        with self.assertLogs("towel.queryset_transform", "DEBUG") as logs:
+            TransformStatsMiddleware(view)(request)
+        self.assertEqual(len(request.transform_stats.transforms), 1)
+        self.assertIn("<lambda>: 1 calls, 7 rows", logs.output[0])
+
+        list(Person.objects.transform(lambda rows: None))
+        self.assertEqual(len(request.transform_stats.transforms), 1)
+
+
+class ConcurrentTransformsTest(TransactionTestCase):
+    def test_concurrent_transforms(self):
+        for i in range(3):
+            Person.objects.create(family_name="Family %s" % i)
+
+        barrier = threading.Barrier(2, timeout=5)
+        threads = {}
+        names = []
+
+        def first(rows):
+            barrier.wait()  # Only passes if second runs concurrently
+            threads["first"] = threading.get_ident()
+            names.append(threading.current_thread().name)
+            for row in rows:
+                row.first = True
+
+        def second(rows):
+            barrier.wait()
+            threads["second"] = threading.get_ident()
+            emails = EmailAddress.objects.filter(person__in=rows).count()
+            for row in rows:
+                row.emails = emails
+
+        @depends_on(first)
+        def third(rows):
+            threads["third"] = threading.get_ident()
+            for row in rows:
+                row.third = row.first
+
+        queryset = Person.objects.transform(third, first, second)
+        self.assertEqual(
+            transform_waves([third, first, second]), [[first, second], [third]]
+        )
+
+        with collect_transform_stats() as stats:
+            people = list(queryset.concurrent_transforms(max_workers=2))
+        self.assertEqual(len(stats.transforms), 3)
+        self.assertEqual(
+            stats.transforms[
+                "testapp.test_queryset_transform.ConcurrentTransformsTest"
+                ".test_concurrent_transforms.<locals>.second"
+            ]["queries"],
+            1,
+        )
+        self.assertEqual(len(people), 3)
+        self.assertTrue(all(p.first and p.third and p.emails == 0 for p in people))
+        self.assertNotEqual(threads["first"], threads["second"])
+        self.assertEqual(threads["third"], threading.get_ident())
+        self.assertTrue(names[-1].startswith("towel-transform"))
+
+        # The thread pool is shared between evaluations
+        pool = set(transform_executor()._threads)
+        barrier = threading.Barrier(2, timeout=5)
+        list(queryset.concurrent_transforms(max_workers=2))
+        self.assertEqual(set(transform_executor()._threads), pool)
+        self.assertIn(threads["first"], {thread.ident for thread in pool})
+
+        # Transforms run one at a time with max_workers=1
+        barrier = threading.Barrier(1)
+        list(queryset.concurrent_transforms(max_workers=1))
+
+        # Transforms run one after another in registration order if not
+        # asked otherwise
+        barrier = threading.Barrier(1)
+        list(Person.objects.transform(first, second, third))
+        self.assertEqual(set(threads.values()), {threading.get_ident()})
+
+    def test_circular_dependencies(self):
+        Person.objects.create()
+
+        def first(rows):
+            pass
+
+        @depends_on(first)
+        def second(rows):
+            pass
+
+        first.transform_dependencies = (second,)
+        with self.assertRaises(ImproperlyConfigured):
+            list(Person.objects.transform(first, second).concurrent_transforms())
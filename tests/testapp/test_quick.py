@@ -1,7 +1,9 @@
 import re
 from datetime import date, timedelta
+from unittest.mock import patch
 
 from django.test import TestCase
+from django.utils import translation
 from testapp.models import Person
 
 from towel import quick
@@ -107,3 +109,141 @@ class QuickTest(TestCase):
             "relation"
             not in quick.parse_quickadd("relationship:(stupidity)", QUICK_RULES)[0]
         )
+
+    def test_compiled_rules(self):
+        rules = [
+            (re.compile(r"!!"), quick.static(important=True)),
+            (re.compile(r"@(?P<value>\w+)"), quick.identity()),
+            (re.compile(r"(?P<value>\w+)@"), lambda v: {"to": v["value"]}),
+            (re.compile(r"\# (?P<value>\d+)  # Comment", re.X), quick.identity()),
+            (re.compile(r"IS:(?P<bool>\w+)", re.I), quick.bool_mapper("active")),
+        ]
+        compiled = quick.compile_rules(rules)
+        self.assertIsNot(compiled.pattern, None)
+        self.assertFalse(compiled.slice)
+        self.assertIs(quick.compile_rules(rules), compiled)
+        self.assertIs(quick.compile_rules(compiled), compiled)
+
+        for string, result in [
+            ("", ({}, [])),
+            ("!! a  b", ({"important": [True]}, ["a", "", "b"])),
+            (" !! x", ({"important": [True]}, ["", "x"])),
+            (
+                "a@ @b #12 is:YES  ",
+                ({"to": ["a"], "value": ["b", "12"], "active": [True]}, []),
+            ),
+            ("@a " + "x" * 20000 + " @b", ({"value": ["a"]}, ["x" * 9996])),
+        ]:
+            data, rest = quick.parse_quickadd(string, rules)
+            self.assertEqual((dict(data.lists()), rest), result)
+
+        # Modified lists are compiled again
+        rules.append((re.compile(r"^\+"), quick.static(plus=True)))
+        self.assertIsNot(quick.compile_rules(rules), compiled)
+        self.assertTrue(quick.compile_rules(rules).slice)
+        data, rest = quick.parse_quickadd("a +b !! +", rules)
+        self.assertEqual(
+            (dict(data.lists()), rest),
+            ({"plus": [True, True], "important": [True]}, ["a", "b"]),
+        )
+
+        # Patterns with numbered backreferences cannot be combined
+        rules.append((re.compile(r"(a)\1"), quick.static(aa=True)))
+        self.assertIs(quick.compile_rules(rules).pattern, None)
+        data, rest = quick.parse_quickadd("b !! aa c", rules)
+        self.assertEqual(
+            (dict(data.lists()), rest),
+            ({"important": [True], "aa": [True]}, ["b", "c"]),
+        )
+
+    def test_model_mapper(self):
+        people = {
+            name: Person.objects.create(family_name=name, given_name="Given")
+            for name in ("Alice", "Bob", "Carol")
+        }
+        mapper = quick.model_mapper(Person.objects.all(), "person", timeout=5)
+        rules = [
+            (re.compile(r"@(?P<family_name>\w+)"), mapper),
+            (re.compile(r"#(?P<pk>\d+)"), quick.model_mapper(Person.objects, "pk")),
+            (
+                re.compile(r"(?P<given_name>\w+)/(?P<family_name>\w+)"),
+                quick.model_mapper(Person.objects.all(), "person"),
+            ),
+        ]
+
+        with self.assertNumQueries(1):
+            data, rest = quick.parse_quickadd("@Carol @Alice x @Unknown @Alice", rules)
+        self.assertEqual(
+            data.getlist("person_"),
+            [people["Carol"], people["Alice"], people["Alice"]],
+        )
+        self.assertEqual(rest, ["x"])
+
+        # Alice is cached, one query per mapper
+        with self.assertNumQueries(2):
+            data, rest = quick.parse_quickadd(
+                "@Bob @Alice @Unknown #%s" % people["Bob"].pk, rules
+            )
+        self.assertEqual(data.getlist("person"), [people["Bob"].pk, people["Alice"].pk])
+        self.assertEqual(data["pk_"], people["Bob"])
+
+        # Misses are not cached
+        unknown = Person.objects.create(family_name="Unknown")
+        with self.assertNumQueries(1):
+            data, rest = quick.parse_quickadd("@Unknown @Alice", rules)
+        self.assertEqual(data.getlist("person_"), [unknown, people["Alice"]])
+
+        # Nothing is cached by default
+        uncached = quick.model_mapper(Person.objects.all(), "person")
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.assertEqual(
+                    uncached({"family_name": "Alice"}),
+                    {"person": people["Alice"].pk, "person_": people["Alice"]},
+                )
+        self.assertEqual(uncached._cache, {})
+
+        # Unhashable values are resolved, but never cached
+        with self.assertNumQueries(1):
+            self.assertEqual(mapper.map_many([{"family_name__in": ["Nobody"]}]), [{}])
+
+        mapper.clear()
+        with self.assertNumQueries(2):
+            data, rest = quick.parse_quickadd("Given/Bob @Alice Given/Carol", rules)
+        self.assertEqual(
+            data.getlist("person_"), [people["Bob"], people["Alice"], people["Carol"]]
+        )
+
+        Person.objects.create(family_name="Alice")
+        mapper.clear()
+        with self.assertRaises(Person.MultipleObjectsReturned):
+            quick.parse_quickadd("@Alice", rules)
+
+    def test_mapper_tables(self):
+        current = [date(2024, 1, 1)]  # A Monday
+
+        class FakeDate(date):
+            @classmethod
+            def today(cls):
+                return current[0]
+
+        mapper = quick.due_mapper("due")
+        with patch("towel.quick.date", FakeDate):
+            self.assertEqual(mapper({"due": "wednesday"}), {"due": date(2024, 1, 3)})
+            with translation.override("de"):
+                self.assertEqual(mapper({"due": "Mittwoch"}), {"due": date(2024, 1, 3)})
+                self.assertEqual(mapper({"due": "Heute"}), {"due": date(2024, 1, 1)})
+
+            # The table rolls over
+            current[0] = date(2024, 1, 3)
+            self.assertEqual(mapper({"due": "Today"}), {"due": date(2024, 1, 3)})
+            self.assertEqual(mapper({"due": "monday"}), {"due": date(2024, 1, 8)})
+            self.assertEqual(mapper({"due": "20.1."}), {"due": date(2024, 1, 20)})
+
+        choices = (("public", translation.gettext_lazy("Today")), ("private", "x"))
+        mapper = quick.model_choices_mapper(choices, "visibility")
+        self.assertEqual(mapper({"value": "Today"}), {"visibility": "public"})
+        with translation.override("de"):
+            self.assertEqual(mapper({"value": "Heute"}), {"visibility": "public"})
+            self.assertEqual(mapper({"value": "Today"}), {})
+        self.assertEqual(mapper({"value": "x"}), {"visibility": "private"})
@@ -1,9 +1,16 @@
+import html
+import re
+from unittest.mock import patch
+
 import django
+from django.core import signing
 from django.test import TestCase
 from django.urls import reverse
 from django.utils.encoding import force_str
 from testapp.models import Resource
 
+from towel.forms import BatchForm
+
 
 class ResourceTest(TestCase):
     def test_list_view(self):
@@ -110,3 +117,53 @@ class ResourceTest(TestCase):
         self.assertTrue("Resource 1" in messages)
         self.assertTrue("Resource 2" in messages)
         self.assertEqual(Resource.objects.filter(is_active=False).count(), 3)
+
+    def test_batch_select_all(self):
+        for i in range(12):
+            Resource.objects.create(name="Resource %s" % i, is_active=bool(i % 2))
+
+        response = self.client.get("/resources/?is_active=3")
+        self.assertContains(response, "Select all 6 matching items")
+        criteria = html.unescape(
+            re.search(
+                r'name="batchform_criteria" value="([^"]*)"',
+                force_str(response.content),
+            ).group(1)
+        )
+        self.assertEqual(
+            signing.loads(criteria, salt=BatchForm.criteria_salt), "is_active=3"
+        )
+
+        data = {
+            "batchform": 1,
+            "batch-action": "delete_selected",
+            "batchform_all": 1,
+            "batchform_criteria": criteria,
+        }
+        with patch("towel.resources.base.ListView.batch_preview_limit", 2):
+            response = self.client.post("/resources/", data)
+        self.assertContains(response, "<li>Resource 0</li>")
+        self.assertContains(response, "<li>Resource 2</li>")
+        self.assertNotContains(response, "<li>Resource 4</li>")
+        self.assertContains(response, "(6)")
+        self.assertContains(response, 'name="batchform_all"')
+        self.assertNotContains(response, 'name="batch_')
+
+        data["confirm"] = 1
+        with patch("towel.forms.BatchForm.chunk_size", 4):
+            with self.assertLogs("towel.forms", "INFO") as logs:
+                response = self.client.post("/resources/", data, follow=True)
+        self.assertRedirects(response, "/resources/")
+        self.assertEqual(
+            logs.output,
+            [
+                "INFO:towel.forms:BatchForm: Processed 4 of 6 items",
+                "INFO:towel.forms:BatchForm: Processed 6 of 6 items",
+            ],
+        )
+        self.assertEqual(
+            [str(m) for m in response.context["messages"]],
+            ["Deletion of 6 objects successful."],
+        )
+        self.assertEqual(Resource.objects.count(), 6)
+        self.assertFalse(Resource.objects.filter(is_active=False).exists())
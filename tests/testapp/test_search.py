@@ -0,0 +1,139 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import TransactionTestCase
+from testapp.models import EmailAddress, Person, Resource
+
+from towel.search import GlobalSearch, search_executor
+
+
+class GlobalSearchTest(TransactionTestCase):
+    def setUp(self):
+        for family_name, given_name in [
+            ("Muster", "Hans"),
+            ("Muster", "Peter"),
+            ("Beispiel", "Hans"),
+        ]:
+            person = Person.objects.create(
+                family_name=family_name, given_name=given_name
+            )
+            EmailAddress.objects.create(
+                person=person, email="%s@example.com" % family_name.lower()
+            )
+        Resource.objects.create(name="Muster room")
+
+    def test_search(self):
+        barrier = threading.Barrier(3, timeout=5)
+        threads = set()
+
+        class TestSearch(GlobalSearch):
+            def search_model(self, *args):
+                barrier.wait()  # Only passes if all models are searched concurrently
+                threads.add(threading.get_ident())
+                return super().search_model(*args)
+
+        search = TestSearch(
+            [Person, (EmailAddress, {"limit": 1}), Resource], limit=5, max_workers=3
+        )
+        groups = search.search("muster")
+        self.assertEqual(
+            [(group.model, len(group.objects), group.has_more) for group in groups],
+            [(Person, 2, False), (EmailAddress, 1, True), (Resource, 1, False)],
+        )
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(groups[1].verbose_name_plural, "email addresses")
+
+        barrier = threading.Barrier(1)
+        self.assertEqual(search.search("  "), [])
+        self.assertEqual(
+            [group.model for group in search.search("hans")], [Person, EmailAddress]
+        )
+
+        # No threads inside atomic blocks
+        threads.clear()
+        with transaction.atomic():
+            groups = search.search("muster")
+        self.assertEqual(len(groups), 3)
+        self.assertEqual(threads, {threading.get_ident()})
+
+    def test_shared_executor(self):
+        threads = set()
+
+        class TestSearch(GlobalSearch):
+            def search_model(self, *args):
+                threads.add(threading.current_thread())
+                return super().search_model(*args)
+
+        search = TestSearch([Person, EmailAddress, Resource])
+        for query in ["muster", "hans", "peter", "muster", "hans", "peter"]:
+            search.search(query)
+
+        # Repeated searches reuse the worker threads of the shared pool
+        # instead of starting three new threads every time
+        self.assertLessEqual(len(threads), 8)
+        self.assertTrue(threads <= set(search_executor()._threads))
+        self.assertTrue(
+            all(thread.name.startswith("towel-search") for thread in threads)
+        )
+
+    def test_timeout(self):
+        search = GlobalSearch([Person, (Resource, {"timeout": 0.1})], timeout=5)
+        search_model = search.search_model
+
+        def slow_search_model(model, *args):
+            if model is Resource:
+                time.sleep(0.5)
+            return search_model(model, *args)
+
+        with patch.object(search, "search_model", slow_search_model):
+            start = time.monotonic()
+            groups = search.search("muster")
+            self.assertLess(time.monotonic() - start, 0.4)
+
+        self.assertEqual([group.model for group in groups], [Person, Resource])
+        self.assertEqual(len(groups[0].objects), 2)
+        self.assertTrue(groups[1].timed_out)
+        self.assertEqual(groups[1].objects, [])
+
+    def test_timeout_starts_with_search(self):
+        search = GlobalSearch([Person, Resource], timeout=0.3, max_workers=1)
+        search_model = search.search_model
+
+        def slow_search_model(*args):
+            time.sleep(0.2)
+            return search_model(*args)
+
+        # Resource waits for Person, but still gets its whole budget
+        with patch.object(search, "search_model", slow_search_model):
+            groups = search.search("muster")
+        self.assertEqual([group.timed_out for group in groups], [False, False])
+        self.assertEqual([len(group.objects) for group in groups], [2, 1])
+
+        def slower_search_model(model, *args):
+            time.sleep(0.5 if model is Person else 0)
+            return search_model(model, *args)
+
+        # Queued searches are not started after waiting for their budget
+        with patch.object(search, "search_model", slower_search_model):
+            start = time.monotonic()
+            groups = search.search("muster")
+            self.assertLess(time.monotonic() - start, 0.45)
+        self.assertEqual([group.timed_out for group in groups], [True, True])
+
+    def test_for_access(self):
+        def for_access(access):
+            return Person.objects.filter(given_name=access)
+
+        search = GlobalSearch([Person, Resource])
+        with patch.object(Person.objects, "for_access", for_access, create=True):
+            groups = search.search("muster", access="Peter")
+            self.assertEqual(
+                [str(person) for person in groups[0].objects], ["Peter Muster"]
+            )
+            self.assertEqual(len(groups[1].objects), 1)
+
+            groups = search.search("muster")
+            self.assertEqual(len(groups[0].objects), 2)
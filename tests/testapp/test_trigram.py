@@ -0,0 +1,95 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from testapp.models import Person, Tag
+
+from towel.trigram.index import TrigramSearchBackend, register, trigrams, unregister
+from towel.trigram.models import Trigram
+
+
+class TrigramIndexTest(TestCase):
+    def setUp(self):
+        register(Person, Person.objects.search_fields)
+        self.addCleanup(unregister, Person)
+        patcher = patch.object(Person.objects, "search_backend", TrigramSearchBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for family_name, given_name in [
+            ("Muster", "Hans"),
+            ("Muster", "Hans Peter"),
+            ("Beispiel", "Peter"),
+            ("Example", "John"),
+        ]:
+            Person.objects.create(family_name=family_name, given_name=given_name)
+
+    def search(self, query):
+        return sorted(str(obj) for obj in Person.objects.search(query))
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams("Hello"), {"hel", "ell", "llo"})
+        self.assertEqual(trigrams("ab"), set())
+
+    def test_search(self):
+        self.assertEqual(self.search("muster"), ["Hans Muster", "Hans Peter Muster"])
+        self.assertEqual(self.search("ter -mus"), ["Peter Beispiel"])
+        self.assertEqual(self.search('"s pe"'), ["Hans Peter Muster"])
+        self.assertEqual(self.search("ex"), ["John Example"])
+        self.assertEqual(self.search("-e"), [])
+
+        # Candidates are resolved using the index
+        sql = str(Person.objects.search("muster").query)
+        self.assertIn("towel_trigram_trigram", sql)
+        # ... but only if the index covers the searched fields
+        sql = str(Person.objects._search("muster", fields=("relationship",)).query)
+        self.assertNotIn("towel_trigram_trigram", sql)
+
+    def test_uuid_primary_keys(self):
+        register(Tag, Tag.objects.search_fields)
+        self.addCleanup(unregister, Tag)
+        patcher = patch.object(Tag.objects, "search_backend", TrigramSearchBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for name in ["Important", "Unimportant", "Other"]:
+            Tag.objects.create(name=name)
+
+        sql = str(Tag.objects.search("important").query)
+        self.assertIn("towel_trigram_trigram", sql)
+        self.assertEqual(
+            sorted(str(tag) for tag in Tag.objects.search("important")),
+            ["Important", "Unimportant"],
+        )
+
+        Tag.objects.get(name="Other").delete()
+        self.assertEqual(Trigram.objects.filter(trigram="oth").count(), 0)
+
+    def test_signals(self):
+        person = Person.objects.get(given_name="John")
+        person.family_name = "Changed"
+        person.save()
+        self.assertEqual(self.search("example"), [])
+        self.assertEqual(self.search("changed"), ["John Changed"])
+
+        person.delete()
+        self.assertEqual(self.search("changed"), [])
+        self.assertFalse(Trigram.objects.filter(object_id=str(person.pk)).exists())
+
+    def test_rebuild(self):
+        Trigram.objects.all().delete()
+        self.assertEqual(self.search("muster"), [])
+
+        stdout = StringIO()
+        call_command("rebuild_trigram_index", "testapp.Person", stdout=stdout)
+        self.assertEqual(stdout.getvalue(), "testapp.Person: Indexed 4 objects\n")
+        self.assertEqual(self.search("muster"), ["Hans Muster", "Hans Peter Muster"])
+
+        call_command("rebuild_trigram_index", chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.search("peter"), ["Hans Peter Muster", "Peter Beispiel"])
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_trigram_index", "testapp.EmailAddress")
+        with self.assertRaises(CommandError):
+            call_command("rebuild_trigram_index", "testapp.Unknown")
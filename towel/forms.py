@@ -1,6 +1,8 @@
 import json
+import logging
 
 from django import forms
+from django.core import signing
 from django.db import models
 from django.db.models import ObjectDoesNotExist
 from django.forms.utils import flatatt
@@ -13,6 +15,9 @@ from django.utils.translation import gettext_lazy as _
 from towel import quick
 
 
+logger = logging.getLogger("towel.forms")
+
+
 class BatchForm(forms.Form):
     """
     This form class can be used to provide batch editing functionality
@@ -97,10 +102,41 @@ class BatchForm(forms.Form):
             </table>
             <button type="submit">Send mail to selected</button>
         </form>
+
+    Instead of checking individual items, all items matching the current
+    search may be selected using ``{% batch_select_all batch_form paginator
+    %}``. The signed search criteria are posted instead of ids in this case
+    (``ModelView`` and ``ListView`` apply them again using
+    ``search_form_data``), and ``batch_queryset`` contains all matching
+    items. Use ``batch_chunks()`` to process them in bounded chunks::
+
+        def process(self):
+            for chunk in self.batch_chunks():
+                chunk.update(is_active=False)
+            messages.success(self.request, 'Processed %(processed)s items.'
+                % self.progress)
     """
 
     _process = False
-    ids = []
+    #: Set of the ids of the selected items, available after validation
+    ids = frozenset()
+    #: Whether all items matching the search criteria have been selected
+    #: instead of individual items
+    select_all = False
+    #: The search criteria of the list as a query string, see
+    #: ``search_criteria``
+    criteria = ""
+    #: Salt used when signing ``criteria``
+    criteria_salt = "towel.forms.BatchForm"
+    #: Number of items matching the criteria before processing them,
+    #: available after validation if all matching items have been selected
+    selected_count = None
+    #: Maximum number of items per chunk yielded by ``batch_chunks``
+    chunk_size = 1000
+    #: Progress of ``batch_chunks``, a dictionary containing the number of
+    #: ``processed`` items, the ``total`` number of items and the number
+    #: of ``chunks``
+    progress = None
 
     def __init__(self, request, queryset, *args, **kwargs):
         kwargs.setdefault("prefix", "batch")
@@ -122,17 +158,51 @@ class BatchForm(forms.Form):
         data = super().clean()
 
         post_data = self.request.POST
-        self.ids = [
-            pk
-            for pk in self.queryset.values_list("id", flat=True)
-            if post_data.get("batch_%s" % pk)
-        ]
+        if post_data.get("batchform_all"):
+            # The search criteria are posted instead of ids; they have been
+            # signed when rendering the list
+            if _posted_criteria(self.request) != self.criteria:
+                raise forms.ValidationError(
+                    _(
+                        "The search criteria have changed, please select the"
+                        " items again."
+                    )
+                )
+            # Counted now, processing may change the matching items
+            self.selected_count = self.queryset.count()
+            if not self.selected_count:
+                raise forms.ValidationError(_("No items selected"))
+            self.select_all = True
+            return data
+
+        # Only the submitted ids are validated against the queryset
+        field = self.queryset.model._meta.get_field("id")
+        selected = set()
+        for key, value in post_data.items():
+            if key.startswith("batch_") and value:
+                try:
+                    selected.add(field.to_python(key[6:]))
+                except forms.ValidationError:
+                    pass
+
+        self.ids = (
+            set(self.queryset.filter(id__in=selected).values_list("id", flat=True))
+            if selected
+            else set()
+        )
 
         if not self.ids:
             raise forms.ValidationError(_("No items selected"))
 
         return data
 
+    @property
+    def signed_criteria(self):
+        """
+        ``criteria`` signed for posting them back, see ``batch_select_all``
+        """
+        return signing.dumps(self.criteria, salt=self.criteria_salt)
+
     def should_process(self):
         """
         Returns true when the submitted form was the batch form, and the
@@ -146,8 +216,61 @@ class BatchForm(forms.Form):
         Returns the queryset containing only items that have been selected
         for batch processing.
         """
+        if self.select_all:
+            return self.queryset
         return self.queryset.filter(id__in=self.ids)
 
+    def batch_chunks(self, chunk_size=None):
+        """
+        Yields querysets containing at most ``chunk_size`` of the selected
+        items each, ordered by primary key. Use this instead of
+        ``batch_queryset`` when processing may involve many items, f.e.
+        when all matching items have been selected. ``progress`` is updated
+        and ``report_progress`` called after each chunk.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        queryset = self.batch_queryset.order_by("pk")
+        self.progress = {"processed": 0, "total": queryset.count(), "chunks": 0}
+
+        last = None
+        while True:
+            pks = queryset if last is None else queryset.filter(pk__gt=last)
+            pks = list(pks.values_list("pk", flat=True)[:chunk_size])
+            if not pks:
+                break
+
+            yield queryset.filter(pk__in=pks)
+            last = pks[-1]
+            self.progress["processed"] += len(pks)
+            self.progress["chunks"] += 1
+            self.report_progress()
+
+    def processed_count(self, result):
+        """
+        Returns the number of processed items, used for the success message
+        when all matching items have been selected and ``process`` returned
+        an iterable. Querysets are assumed to contain the selection, which
+        has been counted before processing because updating the items may
+        change whether they still match.
+        """
+        if self.progress:
+            return self.progress["processed"]
+        if isinstance(result, models.QuerySet):
+            return self.selected_count
+        return len(list(result))
+
+    def report_progress(self):
+        """
+        Called by ``batch_chunks`` after processing a chunk. Logs the
+        progress by default.
+        """
+        logger.info(
+            "%s: Processed %s of %s items",
+            self.__class__.__name__,
+            self.progress["processed"],
+            self.progress["total"],
+        )
+
     def process(self):  # pragma: no cover
         """
         Actually processes the batch form submission. Override this with
@@ -183,6 +306,46 @@ class BatchForm(forms.Form):
         raise NotImplementedError("BatchForm.process has no default implementation.")
 
 
+def search_criteria(search_form):
+    """
+    Returns the search criteria of ``search_form`` (which may be ``None``)
+    as a query string. Batch forms carry those criteria instead of ids when
+    all matching items are selected.
+    """
+    if search_form is None:
+        return ""
+    data = search_form.data.copy()
+    data.pop("s", None)
+    return data.urlencode()
+
+
+def _posted_criteria(request):
+    """
+    Returns the signed search criteria posted by a batch form, or ``None``
+    if they are missing or invalid
+    """
+    try:
+        return signing.loads(
+            request.POST.get("batchform_criteria", ""),
+            salt=BatchForm.criteria_salt,
+        )
+    except signing.BadSignature:
+        return None
+
+
+def search_form_data(request):
+    """
+    Returns the data for search forms: The criteria posted by a batch form
+    which selected all matching items, ``request.GET`` otherwise (the batch
+    form does not validate if the posted criteria are invalid).
+    """
+    if request.method == "POST" and request.POST.get("batchform_all"):
+        criteria = _posted_criteria(request)
+        if criteria is not None:
+            return QueryDict(criteria)
+    return request.GET
+
+
 class SearchForm(forms.Form):
     """
     Supports persistence of searches (stores search in the session). Requires
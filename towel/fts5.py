@@ -0,0 +1,317 @@
+"""
+SQLite FTS5 sidecar index for ``SearchManager``
+===============================================
+
+Keeps a SQLite FTS5 full text index of the ``search_fields`` of models in a
+separate SQLite file (or a second database alias using the SQLite backend)
+and resolves matching primary keys there before filtering the main
+queryset, whatever database the main queryset lives in::
+
+    from towel.fts5 import FTS5Index, FTS5SearchBackend
+
+    index = FTS5Index(path=BASE_DIR / "search.sqlite3")
+
+    class BookManager(SearchManager):
+        search_fields = ("title", "publisher__name")
+        search_backend = FTS5SearchBackend(index)
+
+    # In AppConfig.ready():
+    index.register(Book, Book.objects.search_fields)
+
+Registering models does not access any database; the FTS5 tables are
+created when they are used for the first time.
+
+The index uses the ``trigram`` tokenizer (SQLite 3.34 or better), which
+means that keywords are matched as case-insensitive substrings just like
+``icontains`` lookups. Instances are indexed after the transaction saving
+them has been committed; changes to related objects are not tracked. Use
+``rebuild`` (or ``./manage.py fts5_index --rebuild``) to build the index
+from scratch and ``check`` (or ``./manage.py fts5_index``) to find missing
+and stale entries.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from functools import partial
+from threading import local
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+from towel.managers import IContainsSearchBackend
+
+
+#: All ``FTS5Index`` instances with registered models
+indexes = []
+
+
+def pk_chunks(queryset, chunk_size):
+    """
+    Yields lists of at most ``chunk_size`` primary keys of ``queryset`` in
+    ascending order, without loading all of them at once
+    """
+    queryset = queryset.order_by("pk")
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        pks = list(chunk.values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def match_expression(keywords):
+    """
+    Returns a FTS5 match expression requiring all keywords, quoted as
+    strings so that FTS5 operators in keywords have no effect
+    """
+    return " AND ".join('"%s"' % keyword.replace('"', '""') for keyword in keywords)
+
+
+class FTS5Index:
+    """
+    The sidecar index, stored either in the SQLite file ``path`` or the
+    database alias ``using``, which has to use the SQLite backend
+    """
+
+    def __init__(self, path=None, using=None):
+        if (path is None) == (using is None):
+            raise ImproperlyConfigured("Pass either path or using to FTS5Index.")
+        self.path = path
+        self.using = using
+        self.models = {}
+        self._tables = set()
+        self._local = local()
+
+    @contextmanager
+    def cursor(self):
+        """
+        Returns a cursor for the sidecar database; the changes are committed
+        when leaving the block
+        """
+        if self.using is not None:
+            with transaction.atomic(using=self.using):
+                with connections[self.using].cursor() as cursor:
+                    yield cursor
+            return
+
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(str(self.path))
+        with connection:
+            cursor = connection.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def model_cursor(self, model):
+        """
+        Returns a cursor like ``cursor``, creating the FTS5 table of
+        ``model`` first if necessary
+        """
+        with self.cursor() as cursor:
+            if model not in self._tables:
+                columns = ", ".join('"%s"' % field for field in self.models[model])
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5"
+                    "(object_id UNINDEXED, %s, tokenize='trigram')"
+                    % (self.table(model), columns)
+                )
+            yield cursor
+        self._tables.add(model)
+
+    def table(self, model):
+        return '"towel_fts5_%s"' % model._meta.label_lower.replace(".", "_")
+
+    def register(self, model, fields):
+        """
+        Indexes ``fields`` of ``model`` and keeps the index up to date when
+        instances are saved or deleted. Does not access the database, so
+        that it may be called in ``AppConfig.ready()``.
+        """
+        self.models[model] = tuple(fields)
+        self._tables.discard(model)
+        if self not in indexes:
+            indexes.append(self)
+
+        uid = "towel_fts5_%s" % id(self)
+        post_save.connect(self._post_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(self._post_delete, sender=model, dispatch_uid=uid)
+
+    def unregister(self, model):
+        self.models.pop(model, None)
+        self._tables.discard(model)
+        uid = "towel_fts5_%s" % id(self)
+        post_save.disconnect(sender=model, dispatch_uid=uid)
+        post_delete.disconnect(sender=model, dispatch_uid=uid)
+        if not self.models and self in indexes:
+            indexes.remove(self)
+
+    def _post_save(self, sender, instance, raw=False, **kwargs):
+        if not raw:
+            transaction.on_commit(
+                partial(self.update, sender, [instance.pk]), using=instance._state.db
+            )
+
+    def _post_delete(self, sender, instance, **kwargs):
+        transaction.on_commit(
+            partial(self.delete, sender, [instance.pk]), using=instance._state.db
+        )
+
+    @property
+    def placeholder(self):
+        return "?" if self.using is None else "%s"
+
+    def _rows(self, model, queryset):
+        fields = self.models[model]
+        rows = {}
+        for pk, *values in queryset.values_list("pk", *fields).order_by("pk"):
+            row = rows.setdefault(pk, [[] for field in fields])
+            for column, value in zip(row, values):
+                if value is not None:
+                    column.append(str(value))
+        # Integer primary keys are used as rowid, which makes deleting
+        # entries cheap
+        return [
+            [pk if isinstance(pk, int) else None, str(pk)]
+            + [" ".join(column) for column in row]
+            for pk, row in rows.items()
+        ]
+
+    def _insert(self, cursor, model, rows):
+        cursor.executemany(
+            "INSERT INTO %s (rowid, object_id, %s) VALUES (%s)"
+            % (
+                self.table(model),
+                ", ".join('"%s"' % field for field in self.models[model]),
+                ", ".join([self.placeholder] * (len(self.models[model]) + 2)),
+            ),
+            rows,
+        )
+
+    def _delete(self, cursor, model, pks):
+        for pk in pks:
+            cursor.execute(
+                "DELETE FROM %s WHERE %s = %s"
+                % (
+                    self.table(model),
+                    "rowid" if isinstance(pk, int) else "object_id",
+                    self.placeholder,
+                ),
+                [pk if isinstance(pk, int) else str(pk)],
+            )
+
+    def update(self, model, pks):
+        """
+        Updates the index entries of the given primary keys
+        """
+        rows = self._rows(model, model._base_manager.filter(pk__in=pks))
+        with self.model_cursor(model) as cursor:
+            self._delete(cursor, model, pks)
+            self._insert(cursor, model, rows)
+
+    def delete(self, model, pks):
+        """
+        Removes the index entries of the given primary keys
+        """
+        with self.model_cursor(model) as cursor:
+            self._delete(cursor, model, pks)
+
+    def rebuild(self, model, chunk_size=2000):
+        """
+        Rebuilds the index of ``model`` from scratch, returns the number of
+        indexed objects
+        """
+        queryset = model._base_manager.all()
+        count = 0
+        with self.model_cursor(model) as cursor:
+            cursor.execute("DELETE FROM %s" % self.table(model))
+            for pks in pk_chunks(queryset, chunk_size):
+                self._insert(
+                    cursor, model, self._rows(model, queryset.filter(pk__in=pks))
+                )
+                count += len(pks)
+        return count
+
+    def check(self, model, chunk_size=2000):
+        """
+        Returns a tuple of two sets: Primary keys (as strings) of objects
+        missing from the index and primary keys of stale index entries.
+        The primary keys of the main database are copied into a temporary
+        table of the sidecar database in chunks and compared there.
+        """
+        table = self.table(model)
+        with self.model_cursor(model) as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE towel_fts5_check (object_id TEXT PRIMARY KEY)"
+            )
+            try:
+                for pks in pk_chunks(model._base_manager.all(), chunk_size):
+                    cursor.executemany(
+                        "INSERT INTO towel_fts5_check VALUES (%s)" % self.placeholder,
+                        [[str(pk)] for pk in pks],
+                    )
+                cursor.execute(
+                    "SELECT object_id FROM towel_fts5_check WHERE object_id NOT IN"
+                    " (SELECT object_id FROM %s)" % table
+                )
+                missing = {row[0] for row in cursor.fetchall()}
+                cursor.execute(
+                    "SELECT object_id FROM %s WHERE object_id NOT IN"
+                    " (SELECT object_id FROM towel_fts5_check)" % table
+                )
+                stale = {row[0] for row in cursor.fetchall()}
+            finally:
+                cursor.execute("DROP TABLE temp.towel_fts5_check")
+        return missing, stale
+
+    def search(self, model, keywords, limit=None):
+        """
+        Returns the primary keys (as strings) of objects containing all
+        keywords, or ``None`` if there are more than ``limit`` of them
+        """
+        with self.model_cursor(model) as cursor:
+            cursor.execute(
+                "SELECT object_id FROM %s WHERE %s MATCH %s%s"
+                % (
+                    self.table(model),
+                    self.table(model),
+                    self.placeholder,
+                    "" if limit is None else " LIMIT %d" % (limit + 1),
+                ),
+                [match_expression(keywords)],
+            )
+            pks = [row[0] for row in cursor.fetchall()]
+        return None if limit is not None and len(pks) > limit else pks
+
+
+class FTS5SearchBackend(IContainsSearchBackend):
+    """
+    Search backend resolving candidates using a ``FTS5Index`` before
+    verifying them using ``icontains`` lookups. Keywords shorter than three
+    characters and negated keywords cannot be resolved using the trigram
+    index. If there are more than ``candidate_limit`` candidates, the main
+    queryset is searched without the index to avoid huge ``IN`` clauses.
+    """
+
+    def __init__(self, index, candidate_limit=10000):
+        self.index = index
+        self.candidate_limit = candidate_limit
+
+    def apply(self, queryset, terms, fields, condition):
+        keywords = [
+            keyword for keyword, negate in terms if not negate and len(keyword) >= 3
+        ]
+        if keywords and set(fields) <= set(self.index.models.get(queryset.model, ())):
+            pks = self.index.search(
+                queryset.model, keywords, limit=self.candidate_limit
+            )
+            if pks is not None:
+                pk = queryset.model._meta.pk
+                queryset = queryset.filter(pk__in=[pk.to_python(pk_) for pk_ in pks])
+
+        return super().apply(queryset, terms, fields, condition)
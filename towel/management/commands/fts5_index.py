@@ -0,0 +1,54 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from towel.fts5 import indexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks the consistency of the FTS5 search indexes of all or the given"
+        " models, or rebuilds them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models", nargs="*", metavar="app_label.ModelName", help="Models to index"
+        )
+        parser.add_argument(
+            "--rebuild", action="store_true", help="Rebuild instead of checking"
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        registered = [(index, model) for index in indexes for model in index.models]
+        if options["models"]:
+            try:
+                models = [apps.get_model(label) for label in options["models"]]
+            except (LookupError, ValueError) as exc:
+                raise CommandError(str(exc))
+            missing = set(models) - {model for index, model in registered}
+            if missing:
+                raise CommandError(
+                    "Not indexed: %s"
+                    % ", ".join(sorted(model._meta.label for model in missing))
+                )
+            registered = [
+                (index, model) for index, model in registered if model in models
+            ]
+
+        inconsistent = False
+        for index, model in registered:
+            if options["rebuild"]:
+                count = index.rebuild(model, chunk_size=options["chunk_size"])
+                self.stdout.write("%s: Indexed %s objects" % (model._meta.label, count))
+                continue
+
+            missing, stale = index.check(model, chunk_size=options["chunk_size"])
+            self.stdout.write(
+                "%s: %s missing, %s stale"
+                % (model._meta.label, len(missing), len(stale))
+            )
+            inconsistent = inconsistent or missing or stale
+
+        if inconsistent:
+            raise CommandError("Run fts5_index --rebuild to fix the inconsistencies.")
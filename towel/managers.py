@@ -1,11 +1,22 @@
+import logging
 import re
-from functools import reduce
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial, reduce
+from threading import Lock
 
-from django.db.models import Q
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db import DatabaseError, NotSupportedError, connections
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Q, Value, When
+from django.db.models.constants import LOOKUP_SEP
 
 from towel import queryset_transform
 
 
+logger = logging.getLogger(__name__)
+
+
 def normalize_query(
     query_string,
     findterms=re.compile(r'"([^"]+)"|(\S+)').findall,
@@ -24,17 +35,423 @@ def normalize_query(
     return [normspace(" ", (t[0] or t[1]).strip()) for t in findterms(query_string)]
 
 
+def parse_query(query_string):
+    """
+    Splits the query string using ``normalize_query`` and returns a list of
+    ``(keyword, negate)`` tuples. Keywords prefixed with ``-`` are negated,
+    the ``+`` prefix is removed.
+
+    Example::
+
+        >>> parse_query('+django "shop software" -satchmo')
+        [('django', False), ('shop software', False), ('satchmo', True)]
+
+    """
+    terms = []
+    for keyword in normalize_query(query_string):
+        negate = False
+        if len(keyword) > 1:
+            if keyword[0] == "-":
+                keyword = keyword[1:]
+                negate = True
+            elif keyword[0] == "+":
+                keyword = keyword[1:]
+        terms.append((keyword, negate))
+    return terms
+
+
+class SearchCache:
+    """
+    Bounded LRU cache mapping the search backend, model, database, search
+    fields and the normalized query string to the parsed terms and the
+    condition compiled by the backend, so that the query does not have to
+    be tokenized and compiled again and again (for example when
+    autocompleting). ``info()`` returns hit and miss statistics.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def compile(self, backend, queryset, fields, query):
+        """
+        Returns a ``(terms, condition)`` tuple for the query
+        """
+        key = (
+            backend,
+            queryset.model,
+            queryset.db,
+            tuple(fields),
+            " ".join(query.split()),
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry
+            self.misses += 1
+
+        terms = parse_query(query)
+        entry = (terms, backend.compile(queryset, terms, fields))
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+#: The ``SearchCache`` used by all search managers by default
+search_cache = SearchCache()
+
+
+class IContainsSearchBackend:
+    """
+    Default search backend for ``SearchManager``
+
+    Every keyword has to be contained in at least one of the search fields,
+    negated keywords may not be contained in any of them. Works on all
+    databases, but has to scan the whole table.
+
+    Fields of related models are searched using correlated ``EXISTS``
+    subqueries instead of joins, which means that the results never contain
+    duplicates and do not need ``distinct()``.
+    """
+
+    def condition(self, model, fields, lookup, keyword):
+        """
+        Returns a condition matching objects where at least one of the
+        fields matches ``keyword`` using ``lookup``
+        """
+        local, related = [], []
+        for field in fields:
+            try:
+                is_related = model._meta.get_field(
+                    field.split(LOOKUP_SEP)[0]
+                ).is_relation
+            except FieldDoesNotExist:
+                is_related = False
+            (related if is_related else local).append(field)
+
+        conditions = [Q(**{f"{field}__{lookup}": keyword}) for field in local]
+        if related:
+            conditions.append(
+                Exists(
+                    model._base_manager.filter(pk=OuterRef("pk")).filter(
+                        reduce(
+                            lambda p, q: p | q,
+                            (Q(**{f"{field}__{lookup}": keyword}) for field in related),
+                        )
+                    )
+                )
+            )
+        return reduce(lambda p, q: p | q, conditions)
+
+    def compile(self, queryset, terms, fields):
+        """
+        Returns the condition for the ``(keyword, negate)`` tuples in
+        ``terms`` searching ``fields``, or ``None`` if there is nothing to
+        filter. Only ``queryset.model`` and ``queryset.db`` may influence
+        the result because it is cached (see ``SearchCache``).
+        """
+        conditions = []
+        for keyword, negate in terms:
+            q = self.condition(queryset.model, fields, "icontains", keyword)
+            conditions.append(~q if negate else q)
+        return reduce(lambda p, q: p & q, conditions) if conditions else None
+
+    def apply(self, queryset, terms, fields, condition):
+        """
+        Returns ``queryset`` filtered using the result of ``compile``
+        """
+        return queryset if condition is None else queryset.filter(condition)
+
+    def filter(self, queryset, terms, fields):
+        """
+        Returns ``queryset`` filtered by the ``(keyword, negate)`` tuples
+        in ``terms``, searching ``fields``
+        """
+        return self.apply(
+            queryset, terms, fields, self.compile(queryset, terms, fields)
+        )
+
+    #: Scores of the match types used by ``rank``, the first matching lookup
+    #: wins
+    match_scores = (("iexact", 3), ("istartswith", 2), ("icontains", 1))
+
+    def rank(self, queryset, terms, fields, weights=None):
+        """
+        Returns ``queryset`` annotated with a ``search_rank``. Every keyword
+        matching a field adds the field's weight (from the ``weights``
+        dictionary, earlier fields weigh more by default) times the score of
+        the match type, 3 for exact matches, 2 for prefix and 1 for other
+        substring matches. Objects matching keywords in more or more
+        important fields rank higher.
+        """
+        weights = weights or {}
+        rank = Value(0)
+        for keyword, negate in terms:
+            if negate:
+                continue
+            for i, field in enumerate(fields):
+                weight = weights.get(field, len(fields) - i)
+                rank = rank + Case(
+                    *[
+                        When(
+                            self.condition(queryset.model, [field], lookup, keyword),
+                            then=Value(score * weight),
+                        )
+                        for lookup, score in self.match_scores
+                    ],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+        return queryset.annotate(search_rank=rank)
+
+
+class PostgreSQLSearchBackend(IContainsSearchBackend):
+    """
+    Search backend using PostgreSQL's full text search
+
+    Keywords are converted into a ``SearchQuery`` (quoted keywords into
+    phrase queries), negated keywords are excluded and matched against a
+    ``SearchVector`` of all search fields. Pass ``vector_field`` to use a
+    precomputed (and indexed) ``SearchVectorField`` instead of building the
+    vector on the fly, and ``config`` to choose the text search
+    configuration::
+
+        class BookManager(SearchManager):
+            search_fields = ("title", "description")
+            search_backend = PostgreSQLSearchBackend(
+                config="english", vector_field="search_vector"
+            )
+
+    Note that full text search matches words (or their stems with a
+    language configuration), not arbitrary substrings. Other databases fall
+    back to the ``icontains`` behavior of ``IContainsSearchBackend``.
+    """
+
+    def __init__(self, config=None, vector_field=None):
+        self.config = config
+        self.vector_field = vector_field
+
+    def compile(self, queryset, terms, fields):
+        if connections[queryset.db].vendor != "postgresql":
+            return super().compile(queryset, terms, fields)
+
+        search_query = self.search_query(terms)
+        if search_query is None:
+            return None
+        return Q(**{self.vector_field or "_search_vector": search_query})
+
+    def apply(self, queryset, terms, fields, condition):
+        if (
+            condition is not None
+            and not self.vector_field
+            and connections[queryset.db].vendor == "postgresql"
+        ):
+            queryset = queryset.annotate(_search_vector=self.search_vector(fields))
+        return super().apply(queryset, terms, fields, condition)
+
+    def search_query(self, terms):
+        from django.contrib.postgres.search import SearchQuery
+
+        search_query = None
+        for keyword, negate in terms:
+            q = SearchQuery(
+                keyword,
+                config=self.config,
+                search_type="phrase" if " " in keyword else "plain",
+            )
+            if negate:
+                q = ~q
+            search_query = q if search_query is None else search_query & q
+        return search_query
+
+    def search_vector(self, fields, weights=None):
+        from django.contrib.postgres.search import SearchVector
+
+        if self.vector_field:
+            return F(self.vector_field)
+        elif not weights:
+            return SearchVector(*fields, config=self.config)
+        # PostgreSQL supports the four weights A (highest) to D
+        return reduce(
+            lambda p, q: p + q,
+            (
+                SearchVector(
+                    field,
+                    config=self.config,
+                    weight="ABCD"[min(3, max(0, 4 - weights.get(field, 1)))],
+                )
+                for field in fields
+            ),
+        )
+
+    def rank(self, queryset, terms, fields, weights=None):
+        """
+        Uses ``SearchRank`` on PostgreSQL; ``weights`` (1 to 4) map to the
+        weights D to A and are ignored when using ``vector_field``
+        """
+        if connections[queryset.db].vendor != "postgresql":
+            return super().rank(queryset, terms, fields, weights)
+
+        from django.contrib.postgres.search import SearchRank
+
+        search_query = self.search_query(
+            [(keyword, negate) for keyword, negate in terms if not negate]
+        )
+        if search_query is None:
+            return queryset.annotate(search_rank=Value(0.0))
+        return queryset.annotate(
+            search_rank=SearchRank(self.search_vector(fields, weights), search_query)
+        )
+
+
+def log_slow_search(entry):
+    """
+    Default sink of ``SlowSearchRecorder``, logs slow searches as warnings
+    """
+    logger.warning(
+        "Slow search (%.3fs, %s) on %s: %r\nSQL: %s\n%s",
+        entry["elapsed"],
+        entry["operation"],
+        entry["model"],
+        entry["query"],
+        entry["sql"],
+        entry["explain"] or "",
+        extra={"search": entry},
+    )
+
+
+def model_sink(model):
+    """
+    Returns a sink for ``SlowSearchRecorder`` creating an instance of
+    ``model`` per slow search. The model needs fields named like the keys of
+    the entry: ``model``, ``query``, ``terms``, ``operation``, ``sql``,
+    ``elapsed`` and ``explain``.
+    """
+
+    def sink(entry):
+        model._default_manager.create(**entry)
+
+    return sink
+
+
+class SlowSearchRecorder:
+    """
+    Records searches taking longer than ``threshold`` seconds to evaluate
+    or to count. The entries passed to ``sink`` are dictionaries containing
+    the ``model`` label, the raw ``query``, the normalized ``terms``, the
+    ``operation`` (``fetch`` or ``count``), the generated ``sql``, the
+    ``elapsed`` time in seconds and (if ``explain`` is true and the
+    database supports it) the ``explain`` output::
+
+        class BookManager(SearchManager):
+            search_fields = ("title", "description")
+            search_recorder = SlowSearchRecorder(threshold=0.2)
+    """
+
+    def __init__(self, threshold=0.5, sink=log_slow_search, explain=True):
+        self.threshold = threshold
+        self.sink = sink
+        self.explain = explain
+
+    @contextmanager
+    def measure(self, queryset, operation, query, terms):
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        if elapsed >= self.threshold:
+            self.record(queryset, operation, query, terms, elapsed)
+
+    def record(self, queryset, operation, query, terms, elapsed):
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            sql = ""
+
+        explain = None
+        if self.explain and sql:
+            try:
+                explain = queryset.explain()
+            except (DatabaseError, NotSupportedError):
+                pass
+
+        self.sink(
+            {
+                "model": queryset.model._meta.label,
+                "query": query,
+                "terms": " ".join(
+                    "%s%s" % ("-" if negate else "", keyword)
+                    for keyword, negate in terms
+                ),
+                "operation": operation,
+                "sql": sql,
+                "elapsed": elapsed,
+                "explain": explain,
+            }
+        )
+
+
+class SearchQuerySet(queryset_transform.TransformQuerySet):
+    """
+    Queryset returned by ``SearchManager``, measures the evaluation of
+    searches when using a ``SlowSearchRecorder``
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._search_measure = None
+
+    def _clone(self, *args, **kwargs):
+        c = super()._clone(*args, **kwargs)
+        c._search_measure = self._search_measure
+        return c
+
+    def _fetch_all(self):
+        if self._search_measure is None or self._result_cache is not None:
+            return super()._fetch_all()
+        with self._search_measure(self, "fetch"):
+            super()._fetch_all()
+
+    def count(self):
+        if self._search_measure is None or self._result_cache is not None:
+            return super().count()
+        with self._search_measure(self, "count"):
+            return super().count()
+
+
 class SearchManager(queryset_transform.TransformManager):
     """
     Stupid searching manager
 
-    Does not use fulltext searching abilities of databases. Constructs a query
-    searching specified fields for a freely definable search string. The
-    individual terms may be grouped by using apostrophes, and can be prefixed
-    with + or - signs to specify different searching modes::
+    Does not use fulltext searching abilities of databases by default.
+    Constructs a query searching specified fields for a freely definable
+    search string. The individual terms may be grouped by using apostrophes,
+    and can be prefixed with + or - signs to specify different searching
+    modes::
 
         +django "shop software" -satchmo
 
+    The query itself is built by the ``search_backend``; see
+    ``PostgreSQLSearchBackend`` for using PostgreSQL's full text search.
+
     Usage example::
 
         class MyModelManager(SearchManager):
@@ -50,7 +467,23 @@ class SearchManager(queryset_transform.TransformManager):
 
     search_fields = ()
 
-    def search(self, query):
+    #: The backend building the search query
+    search_backend = IContainsSearchBackend()
+
+    #: Dictionary of search field weights used for ranking results; earlier
+    #: fields weigh more by default
+    search_field_weights = None
+
+    #: ``SearchCache`` for compiled queries, ``None`` disables caching
+    search_cache = search_cache
+
+    #: ``SlowSearchRecorder`` instance recording slow searches, if any
+    search_recorder = None
+
+    def get_queryset(self):
+        return SearchQuerySet(self.model, using=self._db, hints=self._hints)
+
+    def search(self, query, limit=None):
         """
         This implementation stupidly forwards to _search, which does the
         gruntwork.
@@ -58,9 +491,16 @@ class SearchManager(queryset_transform.TransformManager):
         Put your customizations in here.
         """
 
-        return self._search(query)
+        return self._search(query, limit=limit)
 
-    def _search(self, query, fields=None, queryset=None):
+    def _search(self, query, fields=None, queryset=None, rank=False, limit=None):
+        """
+        Searches ``fields`` (defaults to ``search_fields``) of ``queryset``
+        (defaults to all objects) for ``query``. Results are ordered by
+        relevance (see ``rank`` on the search backend) if ``rank`` is true
+        or a ``limit`` is given; the latter returns the ``limit`` most
+        relevant results only.
+        """
         if queryset is None:
             queryset = self.all()
 
@@ -68,30 +508,28 @@ class SearchManager(queryset_transform.TransformManager):
             fields = self.search_fields
 
         if not query or not fields:
-            return queryset
-
-        for keyword in normalize_query(query):
-            negate = False
-            if len(keyword) > 1:
-                if keyword[0] == "-":
-                    keyword = keyword[1:]
-                    negate = True
-                elif keyword[0] == "+":
-                    keyword = keyword[1:]
-
-            if negate:
-                q = reduce(
-                    lambda p, q: p & q,
-                    (~Q(**{"%s__icontains" % f: keyword}) for f in fields),
-                    Q(),
-                )
-            else:
-                q = reduce(
-                    lambda p, q: p | q,
-                    (Q(**{"%s__icontains" % f: keyword}) for f in fields),
-                    Q(),
-                )
+            return queryset if limit is None else queryset[:limit]
 
-            queryset = queryset.filter(q)
+        if self.search_cache is None:
+            terms = parse_query(query)
+            condition = self.search_backend.compile(queryset, terms, fields)
+        else:
+            terms, condition = self.search_cache.compile(
+                self.search_backend, queryset, fields, query
+            )
+        queryset = self.search_backend.apply(queryset, terms, fields, condition)
+        if self.search_recorder is not None and isinstance(queryset, SearchQuerySet):
+            queryset = queryset._chain()
+            queryset._search_measure = partial(
+                self.search_recorder.measure, query=query, terms=terms
+            )
 
-        return queryset
+        if rank or limit is not None:
+            queryset = self.search_backend.rank(
+                queryset, terms, fields, self.search_field_weights
+            )
+            queryset = queryset.order_by(
+                "-search_rank",
+                *(queryset.query.order_by or queryset.model._meta.ordering),
+            )
+        return queryset if limit is None else queryset[:limit]
@@ -1,10 +1,19 @@
+import itertools
+from copy import copy
+from uuid import uuid4
+
 from django import forms
 from django.contrib import messages
 from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.db import transaction
 from django.forms.formsets import all_valid
 from django.forms.models import inlineformset_factory, modelform_factory
-from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect, render
 from django.urls import NoReverseMatch, reverse
 from django.utils.encoding import force_str
@@ -12,10 +21,85 @@ from django.utils.text import capfirst
 from django.utils.translation import gettext, gettext_lazy as _
 
 from towel import deletion, paginator
-from towel.forms import towel_formfield_callback
+from towel.forms import search_criteria, search_form_data, towel_formfield_callback
 from towel.utils import app_model_label, related_classes, safe_queryset_and, tryreverse
 
 
+class StreamingObjectList:
+    """
+    Object list used when showing all objects in a list view. Objects are
+    fetched using ``iterator(chunk_size=...)`` instead of loading all of
+    them into memory at once.
+
+    If the list template renders the rows using ``{% stream_for %}`` (from
+    ``modelview_list``) instead of ``{% for %}``, the rows are not rendered
+    together with the rest of the template; instead, ``streaming_response``
+    returns a ``StreamingHttpResponse`` which renders and sends the rows
+    chunk by chunk. Iterating using ``{% for %}`` still works, but does not
+    stream anything.
+
+    ``len()``, truth testing and ``count()`` use the (capped) number of
+    objects passed as ``count``, so that ``{% if object_list %}`` and
+    ``object_list|length`` work as they do for querysets.
+    """
+
+    def __init__(self, queryset, chunk_size, count):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self._count = count
+        self.marker = "<!-- towel-stream-%s -->" % uuid4().hex
+        self.row = None
+
+    def __iter__(self):
+        return self.queryset.iterator(chunk_size=self.chunk_size)
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def count(self):
+        return self._count
+
+    def capture(self, context, loopvar, nodelist):
+        """
+        Called by ``{% stream_for %}``, remembers what is needed to render
+        the rows later and returns a placeholder for them.
+        """
+        self.row = (copy(context), loopvar, nodelist)
+        return self.marker
+
+    def render_rows(self):
+        context, loopvar, nodelist = self.row
+        objects = iter(self)
+        with context.render_context.push_state(context.template):
+            for chunk in iter(
+                lambda: list(itertools.islice(objects, self.chunk_size)), []
+            ):
+                output = []
+                for item in chunk:
+                    with context.push(**{loopvar: item}):
+                        output.append(nodelist.render(context))
+                yield "".join(output)
+
+    def streaming_response(self, response):
+        """
+        Returns a ``StreamingHttpResponse`` containing the rendered
+        ``response`` with the rows inserted incrementally, or ``response``
+        itself if the template did not use ``{% stream_for %}``.
+        """
+        if self.row is None:
+            return response
+
+        head, tail = response.content.decode(response.charset).split(self.marker, 1)
+        return StreamingHttpResponse(
+            itertools.chain([head], self.render_rows(), [tail]),
+            content_type=response["Content-Type"],
+            status=response.status_code,
+        )
+
+
 class ModelView:
     """
     ``ModelView`` offers list views, detail views and CRUD functionality
@@ -59,9 +143,22 @@ class ModelView:
     #: By default, showing all objects on one page is allowed
     pagination_all_allowed = True
 
+    #: Showing all objects shows at most this many objects. ``None`` means
+    #: no limit.
+    pagination_all_limit = 10000
+
+    #: Objects are fetched and rendered in chunks of this size when showing
+    #: all objects
+    pagination_all_chunk_size = 500
+
     #: The paginator class used for pagination
     paginator_class = paginator.Paginator
 
+    #: The count strategy passed to the paginator, f.e.
+    #: ``towel.paginator.CappedCount(10000)``. ``None`` uses the default
+    #: strategy of the paginator class.
+    count_strategy = None
+
     #: The editing form class
     form_class = None
 
@@ -116,6 +213,13 @@ class ModelView:
                 " to this object."
             ),
         ),
+        "pagination_all_limited": (
+            messages.WARNING,
+            _(
+                "Only the first %(limit)s objects are shown. Please refine"
+                " your search."
+            ),
+        ),
     }
 
     #: User defined messages
@@ -628,25 +732,38 @@ class ModelView:
         """
         Helper which paginates the given object list
 
-        Skips pagination if the magic ``all`` GET parameter is set.
-        """
-        paginator_obj = self.paginator_class(queryset, paginate_by)
-
-        try:
-            page = int(request.GET.get("page", "1"))
-        except ValueError:
-            page = 1
-
-        try:
-            page_obj = paginator_obj.page(page)
-        except (paginator.EmptyPage, paginator.InvalidPage):
-            page_obj = paginator_obj.page(paginator_obj.num_pages)
+        Skips pagination if the magic ``all`` GET parameter is set. At most
+        ``pagination_all_limit`` objects are shown in this case, and they are
+        rendered incrementally if the list template uses ``{% stream_for %}``
+        (see ``StreamingObjectList``). Uses
+        ``paginator_class.page_for_request`` if available, which allows
+        paginators such as ``towel.paginator.KeysetPaginator`` to read their
+        own GET parameters.
+        """
+        kwargs = {}
+        if self.count_strategy is not None:
+            kwargs["count_strategy"] = self.count_strategy
+        paginator_obj = self.paginator_class(queryset, paginate_by, **kwargs)
+
+        if hasattr(paginator_obj, "page_for_request"):
+            page_obj = paginator_obj.page_for_request(request)
+        else:
+            page_obj = paginator_obj.get_page(request.GET.get("page"))
 
         if self.pagination_all_allowed and request.GET.get("all"):
-            page_obj.object_list = queryset
+            count = paginator_obj.count
+            limit = self.pagination_all_limit
+            if limit is not None and count > limit:
+                self.add_message(request, "pagination_all_limited", {"limit": limit})
+                queryset = queryset[:limit]
+                count = limit
+
+            page_obj.object_list = StreamingObjectList(
+                queryset, self.pagination_all_chunk_size, count
+            )
             page_obj.show_all_objects = True
             page_obj.start_index = 1
-            page_obj.end_index = paginator_obj.count
+            page_obj.end_index = count
 
         return page_obj, paginator_obj
 
@@ -689,7 +806,11 @@ class ModelView:
         else:
             ctx[self.template_object_list_name] = queryset
 
-        return self.render_list(request, ctx)
+        response = self.render_list(request, ctx)
+        object_list = ctx[self.template_object_list_name]
+        if isinstance(object_list, StreamingObjectList):
+            return object_list.streaming_response(response)
+        return response
 
     def handle_search_form(self, request, ctx, queryset=None):
         """
@@ -701,7 +822,7 @@ class ModelView:
             queryset = self.get_query_set(request)
 
         if self.search_form:
-            form = self.search_form(request.GET, request=request)
+            form = self.search_form(search_form_data(request), request=request)
             if not form.is_valid():
                 self.add_message(
                     request, _("The search query was invalid."), level=messages.ERROR
@@ -731,6 +852,7 @@ class ModelView:
             return
 
         form = self.batch_form(request, queryset)
+        form.criteria = search_criteria(ctx.get("search_form"))
         ctx["batch_form"] = form
 
         if form.should_process():
@@ -739,6 +861,11 @@ class ModelView:
             if isinstance(result, HttpResponse):
                 return result
 
+            elif form.select_all and hasattr(result, "__iter__"):
+                messages.success(
+                    request, _("Processed %s items.") % form.processed_count(result)
+                )
+
             elif hasattr(result, "__iter__"):
                 messages.success(
                     request,
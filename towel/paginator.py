@@ -20,14 +20,80 @@ The defaults are as follows::
         'END': 6, # pages at the end of the range
         'AROUND': 5, # pages around the current page
         }
+
+Deep ``OFFSET`` pages get slower and slower the deeper they are because the
+database has to skip all preceding rows. :class:`KeysetPaginator` seeks to
+the requested page using the ordering values of the neighbouring row instead
+and emits opaque ``after`` and ``before`` cursors instead of page numbers.
+
+Counting all objects is often the slowest query on filtered list pages. The
+paginator delegates counting to a count strategy, which can be selected per
+paginator (or per view by setting ``count_strategy`` on ``ModelView`` or
+``ListView``)::
+
+    paginator = Paginator(queryset, 20, count_strategy=CappedCount(10000))
+
+The following strategies are available:
+
+- :class:`ExactCount`: ``SELECT COUNT(*)``, the default.
+- :class:`CachedCount`: Exact counts, cached using the compiled SQL and its
+  parameters as cache key.
+- :class:`EstimatedCount`: Uses the estimate of the query planner on
+  PostgreSQL, exact counts for small results and other databases.
+- :class:`CappedCount`: Counts at most ``cap + 1`` rows, big results are
+  shown as ``10,000+``.
+
+Lists which never show totals (infinite scrolling, pickers) can use
+:class:`CountlessPaginator`, which does not count at all and only offers
+links to the previous and to the next page.
+
+:class:`WindowCountPaginator` fetches the total count together with the
+objects on the current page using ``COUNT(*) OVER ()``, which means that
+filters only have to be evaluated once per request.
+
+:class:`SnapshotPaginator` stores the ordered list of primary keys matching
+a search in the cache when the first page is requested and fetches later
+pages by primary key, without evaluating the filters again.
 """
 
 
+import hashlib
+import json
+from functools import reduce
+
 from django.conf import settings
-from django.core import paginator
+from django.core import paginator, signing
+from django.core.cache import caches
+from django.core.exceptions import (
+    EmptyResultSet,
+    ImproperlyConfigured,
+    ValidationError,
+)
+from django.db import connections
+from django.db.models import Count, F, Q, Window
+from django.db.models.expressions import OrderBy
+from django.db.models.query import ModelIterable
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
 
 
-__all__ = ("InvalidPage", "PageNotAnInteger", "EmptyPage", "Paginator", "Page")
+__all__ = (
+    "InvalidPage",
+    "PageNotAnInteger",
+    "EmptyPage",
+    "Paginator",
+    "Page",
+    "ExactCount",
+    "CachedCount",
+    "EstimatedCount",
+    "CappedCount",
+    "CountlessPaginator",
+    "CountlessPage",
+    "WindowCountPaginator",
+    "SnapshotPaginator",
+    "KeysetPaginator",
+    "KeysetPage",
+)
 
 
 # Import useful exceptions into the local scope
@@ -59,15 +125,172 @@ def filter_adjacent(iterable):
             yield item
 
 
+def queryset_digest(queryset):
+    """
+    Returns a digest of the database alias, the compiled SQL and its
+    parameters. Raises ``EmptyResultSet`` if the queryset cannot match
+    anything.
+    """
+    sql, params = queryset.query.sql_with_params()
+    return hashlib.md5(repr((queryset.db, sql, params)).encode("utf-8")).hexdigest()
+
+
+def exact_count(object_list):
+    """
+    Counts querysets using ``count()`` and everything else using ``len()``
+    """
+    try:
+        return object_list.count()
+    except (AttributeError, TypeError):
+        return len(object_list)
+
+
+class ExactCount:
+    """
+    Count strategy returning the exact count of objects.
+
+    Count strategies return a tuple consisting of the count and of either
+    ``None`` if the count is exact, ``"capped"`` if there are more objects
+    than the count or ``"estimated"`` if the count is an estimate.
+    """
+
+    def __call__(self, object_list):
+        return exact_count(object_list), None
+
+
+class CachedCount(ExactCount):
+    """
+    Count strategy caching exact counts. The cache key is built from the
+    database alias, the compiled SQL and its parameters, which means that
+    the same search always shares the same cached count. Counts may be
+    outdated by up to ``timeout`` seconds.
+    """
+
+    def __init__(self, timeout=300, cache="default", key_prefix="towel-count"):
+        self.timeout = timeout
+        self.cache = cache
+        self.key_prefix = key_prefix
+
+    def cache_key(self, queryset):
+        return f"{self.key_prefix}-{queryset_digest(queryset.order_by())}"
+
+    def __call__(self, object_list):
+        try:
+            key = self.cache_key(object_list)
+        except AttributeError:  # Not a queryset
+            return super().__call__(object_list)
+        except EmptyResultSet:
+            return 0, None
+
+        cache = caches[self.cache]
+        count = cache.get(key)
+        if count is None:
+            count = exact_count(object_list)
+            cache.set(key, count, self.timeout)
+        return count, None
+
+
+class EstimatedCount(ExactCount):
+    """
+    Count strategy returning the row estimate of the query planner on
+    PostgreSQL. Estimates below ``threshold`` are replaced by an exact count
+    because estimates are least useful and exact counts cheapest there.
+    Other databases always get exact counts.
+    """
+
+    def __init__(self, threshold=1000):
+        self.threshold = threshold
+
+    def estimate(self, queryset):
+        """
+        Returns the planner estimate for ``queryset`` or ``None`` if the
+        database does not offer one.
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) %s" % sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def __call__(self, object_list):
+        try:
+            estimate = self.estimate(object_list)
+        except AttributeError:  # Not a queryset
+            return super().__call__(object_list)
+        except EmptyResultSet:
+            return 0, None
+
+        if estimate is None or estimate < self.threshold:
+            return super().__call__(object_list)
+        return estimate, "estimated"
+
+
+class CappedCount(ExactCount):
+    """
+    Count strategy counting at most ``cap + 1`` objects. If there are more
+    than ``cap`` objects, ``cap`` is returned and the total is shown as
+    ``10,000+`` in the pagination. Pages after the cap are not reachable
+    by page number.
+    """
+
+    def __init__(self, cap=10000):
+        self.cap = cap
+
+    def __call__(self, object_list):
+        count = exact_count(object_list[: self.cap + 1])
+        if count > self.cap:
+            return self.cap, "capped"
+        return count, None
+
+
 class Paginator(paginator.Paginator):
     """
     Custom paginator returning a Page object with an additional page_range
     method which can be used to implement Digg-style pagination
+
+    Counting is delegated to ``count_strategy``, see above.
     """
 
+    #: The default count strategy
+    count_strategy = ExactCount()
+
+    def __init__(self, *args, count_strategy=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if count_strategy is not None:
+            self.count_strategy = count_strategy
+
+    @cached_property
+    def _count(self):
+        return self.count_strategy(self.object_list)
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_approximation(self):
+        """
+        ``None`` for exact counts, ``"capped"`` or ``"estimated"`` otherwise
+        """
+        return self._count[1]
+
     def page(self, number):
         return Page(paginator.Paginator.page(self, number))
 
+    def page_for_request(self, request):
+        """
+        Returns the page requested by the ``page`` GET parameter. Invalid
+        page numbers return the first page, page numbers which are out of
+        range the last page.
+        """
+        return self.get_page(request.GET.get("page"))
+
 
 class Page(paginator.Page):
     """
@@ -78,7 +301,7 @@ class Page(paginator.Page):
         # We do not call super.__init__, because we're only a wrapper / proxy
         self.__dict__ = page.__dict__
 
-    @property
+    @cached_property
     def page_range(self):
         """
         Generates a list for displaying Digg-style pagination
@@ -88,6 +311,9 @@ class Page(paginator.Page):
         isn't overwritten -- Django's ``page_range`` is a method of the
         ``Paginator`` class, not the ``Page`` class.
 
+        The list is only generated once per page, and only costs as much as
+        the number of links shown, not the number of pages.
+
         Usage::
 
             {% for p in page.page_range %}
@@ -102,20 +328,532 @@ class Page(paginator.Page):
                 {% endif %}
             {% endfor %}
         """
-        return filter_adjacent(self._generate_page_range())
+        return list(self._generate_page_range())
 
     def _generate_page_range(self):
         num_pages = self.paginator.num_pages
 
-        for i in range(1, num_pages + 1):
-            if i <= PAGINATION["START"]:
-                yield i
+        # The START, AROUND and END windows
+        windows = [
+            (1, min(PAGINATION["START"], num_pages)),
+            (
+                max(1, self.number - PAGINATION["AROUND"]),
+                min(num_pages, self.number + PAGINATION["AROUND"]),
+            ),
+            (max(1, num_pages - PAGINATION["END"] + 1), num_pages),
+        ]
+
+        last = 0
+        for start, end in sorted(windows):
+            start = max(start, last + 1)
+            if start > end:
+                continue
+            if start > last + 1:
+                yield None  # Ellipsis marker
+            yield from range(start, end + 1)
+            last = end
+
+        if last < num_pages:
+            yield None
+
+
+def keyset_ordering(queryset):
+    """
+    Returns the ordering of ``queryset`` as a list of ``(field, descending)``
+    tuples. The primary key is appended as a tie-breaker if the ordering does
+    not contain it already, so that the ordering is always total.
+
+    Raises ``ImproperlyConfigured`` if the queryset is ordered randomly or by
+    something else than field names, or if it places ``NULL`` values
+    differently than keyset pagination does (see ``KeysetPaginator``).
+    """
+    query = queryset.query
+    opts = query.get_meta()
+
+    if query.order_by:
+        ordering = query.order_by
+    elif query.default_ordering:
+        ordering = opts.ordering
+    else:
+        ordering = ()
+
+    fields = []
+    for item in ordering:
+        if isinstance(item, OrderBy) and isinstance(item.expression, F):
+            name, descending = item.expression.name, item.descending
+            if (item.nulls_first and not descending) or (
+                item.nulls_last and descending
+            ):
+                raise ImproperlyConfigured(
+                    "Keyset pagination sorts NULL values last in ascending"
+                    " and first in descending order, %r is not supported." % (item,)
+                )
+        elif isinstance(item, F):
+            name, descending = item.name, False
+        elif isinstance(item, str) and item != "?" and "." not in item:
+            name, descending = item.lstrip("-+"), item.startswith("-")
+        else:
+            raise ImproperlyConfigured(
+                "Keyset pagination requires an ordering by field names,"
+                " %r is not supported." % (item,)
+            )
+
+        if name not in (f[0] for f in fields):
+            fields.append((name, descending))
+
+    if not query.standard_ordering:
+        fields = [(name, not descending) for name, descending in fields]
+
+    if not {"pk", opts.pk.name, opts.pk.attname} & {f[0] for f in fields}:
+        fields.append(("pk", False))
+
+    return fields
+
+
+class KeysetPaginator(Paginator):
+    """
+    Paginator seeking to the requested page using the ordering values of
+    the last object on the previous page (respectively the first object on
+    the next page) instead of using ``OFFSET``. Every page costs the same
+    indexed range scan, no matter how deep it is.
+
+    The active ordering of the queryset is used, including orderings chosen
+    through ``SearchForm.orderings``, as long as it only consists of field
+    names (see ``keyset_ordering``). ``NULL`` values are sorted as if they
+    were larger than all other values on all databases, that is last in
+    ascending and first in descending order (the default of PostgreSQL).
+
+    Pages are requested using opaque cursors passed as ``after`` and
+    ``before`` GET parameters::
+
+        paginator = KeysetPaginator(queryset, 20)
+        page = paginator.page_for_request(request)
+        # page.next_cursor, page.previous_cursor
+
+    Invalid, tampered with or outdated cursors (f.e. after changing the
+    ordering) return the first page.
+    """
+
+    #: GET parameters containing the cursors
+    after_parameter = "after"
+    before_parameter = "before"
+
+    #: Salt used when signing cursors
+    cursor_salt = "towel.paginator.KeysetPaginator"
+
+    @cached_property
+    def ordering(self):
+        return keyset_ordering(self.object_list)
+
+    @cached_property
+    def _ordering_key(self):
+        return ["-%s" % f[0] if f[1] else f[0] for f in self.ordering]
+
+    def page_for_request(self, request):
+        return self.keyset_page(
+            after=request.GET.get(self.after_parameter),
+            before=request.GET.get(self.before_parameter),
+        )
 
-            elif i > num_pages - PAGINATION["END"]:
-                yield i
+    def encode_cursor(self, values):
+        """
+        Returns an opaque, signed cursor for the passed ordering values.
+        """
+        return signing.dumps(
+            [
+                self._ordering_key,
+                [
+                    v if v is None or isinstance(v, (bool, int, float, str)) else str(v)
+                    for v in values
+                ],
+            ],
+            salt=self.cursor_salt,
+            compress=True,
+        )
 
-            elif abs(self.number - i) <= PAGINATION["AROUND"]:
-                yield i
+    def decode_cursor(self, cursor):
+        """
+        Returns the ordering values contained in the cursor, or ``None`` if
+        the cursor is invalid or does not match the current ordering.
+        """
+        try:
+            key, values = signing.loads(cursor, salt=self.cursor_salt)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+        if key != self._ordering_key or len(values) != len(self.ordering):
+            return None
+        return values
 
+    def _keyset_queryset(self, reverse):
+        # Orders by the annotations instead of the fields so that the
+        # filters of _keyset_filter use the same joins
+        order_by = []
+        for i, (name, descending) in enumerate(self.ordering):
+            if descending != reverse:
+                order_by.append(F("_keyset_%s" % i).desc(nulls_first=True))
             else:
-                yield None  # Ellipsis marker
+                order_by.append(F("_keyset_%s" % i).asc(nulls_last=True))
+
+        queryset = self.object_list
+        if not queryset.query.standard_ordering:
+            # reverse() has already been taken into account by ordering
+            queryset = queryset.reverse()
+
+        return queryset.annotate(
+            **{"_keyset_%s" % i: F(f[0]) for i, f in enumerate(self.ordering)}
+        ).order_by(*order_by)
+
+    def _keyset_filter(self, values, reverse):
+        """
+        Returns a ``Q`` object selecting all rows after the passed ordering
+        values (respectively before them if ``reverse`` is ``True``).
+        ``NULL`` is larger than all other values.
+        """
+        equal = Q()
+        clauses = []
+        for i, ((name, descending), value) in enumerate(zip(self.ordering, values)):
+            alias = "_keyset_%s" % i
+            if descending != reverse:
+                # Smaller values follow
+                if value is None:
+                    clauses.append(equal & Q(**{"%s__isnull" % alias: False}))
+                else:
+                    clauses.append(equal & Q(**{"%s__lt" % alias: value}))
+            elif value is not None:
+                # Larger values follow; nothing is larger than NULL
+                clauses.append(
+                    equal
+                    & (
+                        Q(**{"%s__gt" % alias: value})
+                        | Q(**{"%s__isnull" % alias: True})
+                    )
+                )
+
+            if value is None:
+                equal &= Q(**{"%s__isnull" % alias: True})
+            else:
+                equal &= Q(**{alias: value})
+
+        return reduce(lambda p, q: p | q, clauses)
+
+    def _keyset_values(self, item):
+        return [getattr(item, "_keyset_%s" % i) for i in range(len(self.ordering))]
+
+    def keyset_page(self, after=None, before=None):
+        """
+        Returns the page following the ``after`` cursor, or the page
+        preceding the ``before`` cursor. Returns the first page if no valid
+        cursor is passed.
+        """
+        reverse = bool(before and not after)
+        values = self.decode_cursor(before if reverse else after or "")
+
+        queryset = self._keyset_queryset(reverse)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._keyset_filter(values, reverse))
+            except (TypeError, ValueError, ValidationError):
+                values = None
+
+        if values is None:
+            reverse = False
+            queryset = self._keyset_queryset(reverse)
+
+        object_list = list(queryset[: self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[: self.per_page]
+
+        if reverse:
+            object_list.reverse()
+            return KeysetPage(object_list, self, has_next=True, has_previous=has_more)
+        return KeysetPage(
+            object_list, self, has_next=has_more, has_previous=values is not None
+        )
+
+
+class KeysetPage(paginator.Page):
+    """
+    Page returned by ``KeysetPaginator``. Keyset pages have no page number,
+    link to the neighbouring pages using ``next_cursor`` and
+    ``previous_cursor`` instead::
+
+        {% if page.has_previous %}
+            <a href="?before={{ page.previous_cursor|urlencode }}">&laquo;</a>
+        {% endif %}
+        {% if page.has_next %}
+            <a href="?after={{ page.next_cursor|urlencode }}">&raquo;</a>
+        {% endif %}
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # The cursors are derived from the first and the last object; keep
+        # them around because object_list may be replaced later (f.e. when
+        # showing all objects)
+        self._edges = (object_list[0], object_list[-1]) if object_list else None
+
+    def __repr__(self):
+        return "<Keyset page of %s>" % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @cached_property
+    def next_cursor(self):
+        if not (self._has_next and self._edges):
+            return None
+        return self.paginator.encode_cursor(
+            self.paginator._keyset_values(self._edges[1])
+        )
+
+    @cached_property
+    def previous_cursor(self):
+        if not (self._has_previous and self._edges):
+            return None
+        return self.paginator.encode_cursor(
+            self.paginator._keyset_values(self._edges[0])
+        )
+
+
+def _validate_lower_bound(number):
+    """
+    Validates page numbers without looking at the upper bound, which would
+    require counting.
+    """
+    try:
+        if isinstance(number, float) and not number.is_integer():
+            raise ValueError
+        number = int(number)
+    except (TypeError, ValueError):
+        raise PageNotAnInteger(_("That page number is not an integer"))
+    if number < 1:
+        raise EmptyPage(_("That page number is less than 1"))
+    return number
+
+
+class CountlessPaginator(Paginator):
+    """
+    Paginator which never counts. ``per_page + 1`` objects are fetched to
+    determine whether a next page exists. Pages do not know the total
+    count of objects, therefore the pagination only contains links to the
+    previous and to the next page.
+
+    Invalid page numbers return the first page. Page numbers after the last
+    page return an empty page, because the last page cannot be determined
+    without counting.
+    """
+
+    def validate_number(self, number):
+        return _validate_lower_bound(number)
+
+    def get_page(self, number):
+        try:
+            number = self.validate_number(number)
+        except InvalidPage:
+            number = 1
+        return self.page(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom : bottom + self.per_page + 1])
+        return CountlessPage(
+            object_list[: self.per_page],
+            number,
+            self,
+            has_next=len(object_list) > self.per_page,
+        )
+
+
+class CountlessPage(paginator.Page):
+    """
+    Page returned by ``CountlessPaginator``. ``has_next`` is determined by
+    the additional object fetched, ``start_index`` and ``end_index`` do not
+    need the total count either.
+    """
+
+    is_countless = True
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def __repr__(self):
+        return "<Page %s>" % self.number
+
+    def has_next(self):
+        return self._has_next
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return self.paginator.per_page * (self.number - 1) + 1
+
+    def end_index(self):
+        if not self.object_list:
+            return 0
+        return self.paginator.per_page * (self.number - 1) + len(self.object_list)
+
+
+class WindowCountPaginator(Paginator):
+    """
+    Paginator fetching the total count in the same query as the objects on
+    the requested page by annotating the page query with ``COUNT(*) OVER
+    ()``. A separate count (using the count strategy) is only necessary
+    when the requested page is empty, f.e. because the page number is out
+    of range.
+
+    Falls back to the standard behavior of ``Paginator`` if the database
+    does not support window functions, for ``distinct()`` querysets
+    because the window is evaluated before removing duplicates, and for
+    ``values()`` and ``values_list()`` querysets whose rows cannot carry
+    the count.
+    """
+
+    #: Name of the annotation containing the total count
+    count_alias = "_paginator_count"
+
+    def use_window_count(self):
+        """
+        Returns whether the count can be fetched together with the page.
+        """
+        query = getattr(self.object_list, "query", None)
+        return (
+            query is not None
+            and "_count" not in self.__dict__
+            and not query.distinct
+            and not query.is_sliced
+            and issubclass(self.object_list._iterable_class, ModelIterable)
+            and connections[self.object_list.db].features.supports_over_clause
+        )
+
+    def get_page(self, number):
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            return self.page(self.num_pages)
+
+    def page(self, number):
+        if not self.use_window_count():
+            return super().page(number)
+
+        number = _validate_lower_bound(number)
+        bottom = (number - 1) * self.per_page
+        queryset = self.object_list.annotate(
+            **{self.count_alias: Window(expression=Count("*"))}
+        )
+        object_list = list(queryset[bottom : bottom + self.per_page + self.orphans])
+
+        if object_list:
+            count = getattr(object_list[0], self.count_alias)
+            self.__dict__["_count"] = (count, None)
+            if bottom + self.per_page + self.orphans < count:
+                object_list = object_list[: self.per_page]
+
+        # Raises EmptyPage if the page number is out of range; with orphans,
+        # pages after the last page may still return rows. Empty pages are
+        # counted using the count strategy.
+        self.validate_number(number)
+
+        return Page(self._get_page(object_list, number, self))
+
+
+class SnapshotPaginator(Paginator):
+    """
+    Paginator storing the ordered list of primary keys matching the
+    queryset in the cache. The snapshot is keyed on the compiled SQL, which
+    means that the same search with the same ordering always uses the same
+    snapshot. Later pages are fetched using ``pk__in`` and do not have to
+    evaluate expensive filters on the whole table again, and counting the
+    objects is free.
+
+    The snapshot is rebuilt when the first page is requested through
+    ``page_for_request`` (that is, when starting a new search) and expires
+    after ``snapshot_timeout`` seconds. Searches matching more than
+    ``snapshot_max_size`` objects are paginated as usual; this is
+    remembered for ``snapshot_timeout`` seconds too, even when requesting
+    the first page again.
+
+    Objects created after taking the snapshot do not show up until the
+    snapshot is rebuilt, deleted objects are left out.
+    """
+
+    #: Cache alias, timeout and key prefix used for snapshots
+    snapshot_cache = "default"
+    snapshot_timeout = 600
+    snapshot_key_prefix = "towel-snapshot"
+
+    #: Snapshots are not taken if more objects than this match
+    snapshot_max_size = 10000
+
+    #: Rebuild the snapshot even if it exists already
+    refresh_snapshot = False
+
+    def page_for_request(self, request):
+        if request.GET.get("page", "1") == "1":
+            self.refresh_snapshot = True
+        return super().page_for_request(request)
+
+    @cached_property
+    def snapshot(self):
+        """
+        The ordered list of primary keys or ``None`` if there are too many
+        objects to take a snapshot.
+        """
+        try:
+            key = "%s-%s" % (
+                self.snapshot_key_prefix,
+                queryset_digest(self.object_list),
+            )
+        except EmptyResultSet:
+            return []
+
+        cache = caches[self.snapshot_cache]
+        pks = cache.get(key)
+        if pks is False:
+            # Known to be too big; rebuilding would only fetch and throw
+            # away snapshot_max_size primary keys again
+            return None
+        if pks is None or self.refresh_snapshot:
+            pks = list(
+                dict.fromkeys(
+                    self.object_list.values_list("pk", flat=True)[
+                        : self.snapshot_max_size + 1
+                    ]
+                )
+            )
+            if len(pks) > self.snapshot_max_size:
+                pks = False  # Remember that the result is too big
+            cache.set(key, pks, self.snapshot_timeout)
+
+        return None if pks is False else pks
+
+    @cached_property
+    def _count(self):
+        if self.snapshot is None:
+            return self.count_strategy(self.object_list)
+        return len(self.snapshot), None
+
+    def page(self, number):
+        if self.snapshot is None:
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+
+        pks = self.snapshot[bottom:top]
+        objects = {obj.pk: obj for obj in self.object_list.filter(pk__in=pks)}
+        object_list = [objects[pk] for pk in pks if pk in objects]
+        return Page(self._get_page(object_list, number, self))
@@ -82,18 +82,363 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
 
-from django.db import models
+import copy
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from threading import Lock, local
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connections, models
+from django.db.models.query import (
+    NamedValuesListIterable,
+    ValuesIterable,
+    ValuesListIterable,
+)
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+from django.utils.deprecation import MiddlewareMixin
+
+
+logger = logging.getLogger(__name__)
+
+#: Sent after each transform with the model as sender and the arguments
+#: ``name`` (the qualified name of the transform), ``rows`` (the number of
+#: rows passed in), ``duration`` (wall time in seconds) and ``queries`` (the
+#: number of SQL queries executed by the transform). Measurements are only
+#: taken if there are receivers or ``collect_transform_stats`` is active.
+transform_executed = Signal()
+
+
+#: Row shapes transforms may support: Model instances, dictionaries
+#: (``values()``) and tuples (``values_list()``)
+INSTANCES, DICTS, TUPLES = "instances", "dicts", "tuples"
+
+
+def row_shapes(*shapes):
+    """
+    Declares the row shapes a transform supports::
+
+        @row_shapes(INSTANCES, DICTS)
+        def lookup_tags(rows):
+            pks = [row.pk if hasattr(row, "pk") else row["pk"] for row in rows]
+            ...
+
+    Transforms without a declaration are only applied to model instances.
+    Tuples cannot be modified in place; transforms declaring their support
+    may return a list of replacement rows instead (this works for all row
+    shapes).
+    """
+
+    def _fn(fn):
+        fn.row_shapes = frozenset(shapes)
+        return fn
+
+    return _fn
+
+
+def depends_on(*transforms):
+    """
+    Declares that a transform has to run after the given transforms when
+    transforms are executed concurrently (see
+    ``TransformQuerySet.concurrent_transforms``)::
+
+        @depends_on(lookup_tags)
+        def lookup_tag_colors(rows):
+            ...
+
+    Dependencies which are not registered with the queryset are ignored.
+    """
+
+    def _fn(fn):
+        fn.transform_dependencies = transforms
+        return fn
+
+    return _fn
+
+
+def transform_waves(transforms):
+    """
+    Groups transforms into waves; transforms in a wave only depend on
+    transforms in earlier waves
+    """
+    waves, done, remaining = [], [], list(transforms)
+    while remaining:
+        wave = [
+            fn
+            for fn in remaining
+            if all(
+                dep in done or dep not in transforms
+                for dep in getattr(fn, "transform_dependencies", ())
+            )
+        ]
+        if not wave:
+            raise ImproperlyConfigured(
+                "Circular transform dependencies: %r" % (remaining,)
+            )
+        waves.append(wave)
+        done.extend(wave)
+        remaining = [fn for fn in remaining if fn not in wave]
+    return waves
+
+
+def transform_name(fn):
+    """
+    Returns the qualified name of a transform function or callable
+    """
+    if not hasattr(fn, "__qualname__"):
+        fn = type(fn)
+    return f"{fn.__module__}.{fn.__qualname__}"
+
+
+def _measure(fn, rows):
+    """
+    Runs the transform and returns its result, wall time and the number of
+    SQL queries executed in this thread
+    """
+    queries = 0
+
+    def count(execute, *args):
+        nonlocal queries
+        queries += 1
+        return execute(*args)
+
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(count))
+        start = time.perf_counter()
+        result = fn(rows)
+        duration = time.perf_counter() - start
+    return result, duration, queries
+
+
+_executor = None
+_executor_lock = Lock()
+_worker = local()
+
+
+def transform_executor():
+    """
+    Returns the thread pool shared by all concurrently executed transforms.
+    Its size is bounded by the ``TOWEL_TRANSFORM_WORKERS`` setting (default
+    ``8``), which also bounds the number of additional database connections
+    held by the process.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "TOWEL_TRANSFORM_WORKERS", 8),
+                thread_name_prefix="towel-transform",
+            )
+        return _executor
+
+
+def _run_in_thread(fn, rows, measure):
+    # Database connections of worker threads are kept and recycled the same
+    # way Django recycles them between requests (respecting CONN_MAX_AGE)
+    close_old_connections()
+    _worker.active = True
+    try:
+        return _measure(fn, rows) if measure else (fn(rows), None, None)
+    finally:
+        _worker.active = False
+        close_old_connections()
+
+
+class TransformStats:
+    """
+    Aggregates transform measurements per transform name
+    """
+
+    def __init__(self):
+        self.transforms = {}
+
+    def record(self, name, rows, duration, queries, **kwargs):
+        stats = self.transforms.setdefault(
+            name, {"calls": 0, "rows": 0, "duration": 0.0, "queries": 0}
+        )
+        stats["calls"] += 1
+        stats["rows"] += rows
+        stats["duration"] += duration
+        stats["queries"] += queries
+
+
+_collectors = local()
+
+
+@contextmanager
+def collect_transform_stats():
+    """
+    Collects the measurements of all transforms executed by the current
+    thread (including transforms running concurrently on behalf of it)::
+
+        with collect_transform_stats() as stats:
+            list(queryset)
+
+        for name, values in stats.transforms.items():
+            statsd.timing("transform.%s" % name, values["duration"])
+    """
+    stats = TransformStats()
+    if not hasattr(_collectors, "stack"):
+        _collectors.stack = []
+    _collectors.stack.append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors.stack.remove(stats)
+
+
+class TransformStatsMiddleware(MiddlewareMixin):
+    """
+    Collects transform measurements per request, makes them available as
+    ``request.transform_stats`` and passes them to ``export``, which logs
+    them at the debug level by default. Override ``export`` to send them
+    to your metrics system instead. Transforms executed while streaming a
+    response are not included.
+    """
+
+    def process_request(self, request):
+        request._transform_stats = collect_transform_stats()
+        request.transform_stats = request._transform_stats.__enter__()
+
+    def process_response(self, request, response):
+        if hasattr(request, "_transform_stats"):
+            request._transform_stats.__exit__(None, None, None)
+            del request._transform_stats
+            self.export(request, request.transform_stats)
+        return response
+
+    def export(self, request, stats):
+        for name, values in stats.transforms.items():
+            logger.debug(
+                "%s %s: %s calls, %s rows, %.1f ms, %s queries",
+                request.path,
+                name,
+                values["calls"],
+                values["rows"],
+                values["duration"] * 1000,
+                values["queries"],
+            )
+
+
+class CachedTransform:
+    """
+    Transform attaching a value per model instance as ``attribute``, using
+    the cache to avoid fetching values more than once::
+
+        def fetch_tags(pks):
+            tags = {}
+            for item_id, name in Item.tags.through.objects.filter(
+                item__in=pks
+            ).values_list("item", "tag__name"):
+                tags.setdefault(item_id, []).append(name)
+            return tags
+
+        item_tags = CachedTransform("fetched_tags", fetch_tags, default=[])
+        item_tags.invalidate_on(
+            Item.tags.through, related=lambda instance: [instance.item_id]
+        )
+
+        Item.objects.transform(item_tags)
+
+    Values of all instances are looked up using one ``get_many`` call. The
+    misses are fetched using one call of ``fetch(pks)``, which should return
+    a dictionary mapping primary keys to values; primary keys not contained
+    in the dictionary get ``default``, which is copied for every instance
+    so that mutable defaults such as ``[]`` are not shared. Pass a callable
+    (f.e. ``default=list``) to create the default values instead. The
+    fetched values are written back using ``set_many``.
+    """
+
+    row_shapes = frozenset((INSTANCES,))
+
+    def __init__(
+        self,
+        attribute,
+        fetch,
+        default=None,
+        timeout=300,
+        cache="default",
+        key_prefix=None,
+    ):
+        self.attribute = attribute
+        self.fetch = fetch
+        self.default = default
+        self.timeout = timeout
+        self.cache = cache
+        self.key_prefix = key_prefix or "towel-transform-{}-{}.{}".format(
+            attribute, fetch.__module__, fetch.__qualname__
+        )
+
+    def get_default(self):
+        if callable(self.default):
+            return self.default()
+        return copy.deepcopy(self.default)
+
+    def cache_key(self, pk):
+        return f"{self.key_prefix}-{pk}"
+
+    def __call__(self, rows):
+        keys = [self.cache_key(row.pk) for row in rows]
+        cache = caches[self.cache]
+        values = cache.get_many(keys)
+
+        missing = {row.pk: key for row, key in zip(rows, keys) if key not in values}
+        if missing:
+            fetched = self.fetch(list(missing))
+            missing = {
+                key: fetched[pk] if pk in fetched else self.get_default()
+                for pk, key in missing.items()
+            }
+            cache.set_many(missing, self.timeout)
+            values.update(missing)
+
+        for row, key in zip(rows, keys):
+            setattr(row, self.attribute, values[key])
+
+    def invalidate(self, pks):
+        """
+        Removes the cached values of the given primary keys
+        """
+        caches[self.cache].delete_many([self.cache_key(pk) for pk in pks])
+
+    def invalidate_on(self, sender, related=None):
+        """
+        Invalidates cached values when instances of ``sender`` are saved or
+        deleted. ``related`` maps the changed instance to the primary keys
+        of the transformed instances whose values depend on it and defaults
+        to the changed instance's own primary key. Other signals (e.g.
+        ``m2m_changed``) can be connected to ``invalidate`` directly.
+        """
+
+        def receiver(sender, instance, **kwargs):
+            self.invalidate(related(instance) if related else [instance.pk])
+
+        post_save.connect(receiver, sender=sender, weak=False)
+        post_delete.connect(receiver, sender=sender, weak=False)
+        return receiver
 
 
 class TransformQuerySet(models.query.QuerySet):
+    #: Chunk size used by ``iterator()`` if no explicit chunk size is given,
+    #: the same as Django's default
+    default_chunk_size = 2000
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._transform_fns = []
+        self._transform_workers = None
         self._orig_iterable_class = getattr(self, "_iterable_class", None)
 
     def _clone(self, *args, **kwargs):
         c = super()._clone(*args, **kwargs)
         c._transform_fns = self._transform_fns[:]
+        c._transform_workers = self._transform_workers
         return c
 
     def transform(self, *fn):
@@ -101,11 +446,121 @@ class TransformQuerySet(models.query.QuerySet):
         c._transform_fns.extend(fn)
         return c
 
+    def concurrent_transforms(self, max_workers=4):
+        """
+        Runs independent transforms concurrently on the shared thread pool
+        (see ``transform_executor``), at most ``max_workers`` of them at a
+        time per evaluation. Transforms declaring dependencies using
+        ``depends_on`` run after the transforms they depend on. Replacement
+        rows returned by transforms are applied in registration order once
+        all transforms of a wave are done.
+
+        The worker threads use their own database connections, which are
+        kept open according to ``CONN_MAX_AGE``. Because those connections
+        cannot see uncommitted changes, transforms run one after another
+        when the queryset is evaluated inside an atomic block (or inside
+        another concurrently executed transform). Pass ``None`` to switch
+        off concurrent execution again.
+        """
+        c = self._clone()
+        c._transform_workers = max_workers
+        return c
+
+    def _row_shape(self):
+        iterable_class = getattr(self, "_iterable_class", None)
+        if iterable_class == self._orig_iterable_class:
+            return INSTANCES
+        elif iterable_class is None:
+            return None
+        elif issubclass(iterable_class, ValuesIterable):
+            return DICTS
+        elif issubclass(iterable_class, (ValuesListIterable, NamedValuesListIterable)):
+            return TUPLES
+        # values_list(flat=True) has nothing transforms could extend
+        return None
+
+    def _transforms(self):
+        shape = self._row_shape()
+        return [
+            fn
+            for fn in self._transform_fns
+            if shape in getattr(fn, "row_shapes", (INSTANCES,))
+        ]
+
+    def _apply_transforms(self, rows, transforms):
+        workers = self._transform_workers
+        if (
+            workers
+            and len(transforms) > 1
+            and not connections[self.db].in_atomic_block
+            and not getattr(_worker, "active", False)
+        ):
+            waves = transform_waves(transforms)
+        else:
+            waves = [[fn] for fn in transforms]
+
+        collectors = getattr(_collectors, "stack", ())
+        send = transform_executed.has_listeners(self.model)
+        measure = send or bool(collectors)
+        for wave in waves:
+            if len(wave) > 1:
+                results = []
+                for i in range(0, len(wave), workers):
+                    futures = [
+                        transform_executor().submit(_run_in_thread, fn, rows, measure)
+                        for fn in wave[i : i + workers]
+                    ]
+                    results.extend(future.result() for future in futures)
+            elif measure:
+                results = [_measure(wave[0], rows)]
+            else:
+                results = [(wave[0](rows), None, None)]
+
+            for fn, (result, duration, queries) in zip(wave, results):
+                if measure:
+                    measurement = {
+                        "name": transform_name(fn),
+                        "rows": len(rows),
+                        "duration": duration,
+                        "queries": queries,
+                    }
+                    for stats in collectors:
+                        stats.record(**measurement)
+                    if send:
+                        transform_executed.send(sender=self.model, **measurement)
+                if result is not None and hasattr(fn, "row_shapes"):
+                    rows = list(result)
+        return rows
+
     def _fetch_all(self):
+        fetched = self._result_cache is None
         super()._fetch_all()
-        if getattr(self, "_iterable_class", None) == self._orig_iterable_class:  # noqa
-            for fn in self._transform_fns:
-                fn(self._result_cache)
+        if fetched:
+            self._result_cache = self._apply_transforms(
+                self._result_cache, self._transforms()
+            )
+
+    def iterator(self, chunk_size=None):
+        """
+        Runs the transforms once per chunk of ``chunk_size`` rows instead of
+        skipping them, so that memory usage stays flat while related lookups
+        stay batched.
+        """
+        kwargs = {} if chunk_size is None else {"chunk_size": chunk_size}
+        iterator = super().iterator(**kwargs)
+        transforms = self._transforms()
+        if not transforms:
+            return iterator
+        return self._transform_chunks(
+            iterator, chunk_size or self.default_chunk_size, transforms
+        )
+
+    def _transform_chunks(self, iterator, chunk_size, transforms):
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield from self._apply_transforms(chunk, transforms)
 
 
 if hasattr(models.Manager, "from_queryset"):
@@ -36,12 +36,157 @@ Usage example::
 """
 
 
+import operator
+import re
+import time
 from datetime import date, timedelta
+from functools import reduce
 
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
 from django.utils import dateformat
 from django.utils.datastructures import MultiValueDict
 from django.utils.encoding import force_str
-from django.utils.translation import gettext as _
+from django.utils.translation import get_language, gettext as _
+
+
+_FLAGS = (
+    (re.IGNORECASE, "i"),
+    (re.MULTILINE, "m"),
+    (re.DOTALL, "s"),
+    (re.VERBOSE, "x"),
+    (re.ASCII, "a"),
+)
+_GROUP_NAME = re.compile(r"\(\?(P<|P=|\()([A-Za-z_]\w*)")
+#: Constructs which do not work when matching inside a longer string or
+#: cannot be combined with other patterns
+_POSITIONAL = re.compile(r"(?<![\[\\])\^|\\[AbB]|\(\?<[=!]")
+_NUMBERED = re.compile(r"\\[1-9]|\(\?\(\d")
+
+
+class QuickRules:
+    """
+    A list of quick rules compiled into a single alternation of all regular
+    expressions, which allows tokenizing the quick string in one pass
+    instead of trying each rule at each position. The result of
+    :func:`parse_quickadd` does not change. Rules which cannot be combined
+    (for example because they use numbered backreferences) make the
+    instance fall back to trying the rules one after another.
+
+    :func:`parse_quickadd` compiles and caches the rules passed to it
+    automatically, it is not necessary to use this class directly.
+    """
+
+    def __init__(self, rules):
+        self.source = list(rules)
+        self.rules = [tuple(rule) for rule in rules]
+        #: The combined pattern or ``None``
+        self.pattern = None
+        #: Whether rules depend on the characters before the match
+        self.slice = False
+        self.groups = {}
+
+        try:
+            parts = []
+            for index, (regexp, extract) in enumerate(self.rules):
+                parts.append(self._part(index, regexp))
+            self.pattern = re.compile("|".join(parts))
+        except (AttributeError, TypeError, ValueError, re.error):
+            self.pattern = None
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _part(self, index, regexp):
+        source = regexp.pattern
+        if not isinstance(source, str) or _NUMBERED.search(source):
+            raise ValueError("Cannot combine %r" % regexp)
+
+        flags = regexp.flags & ~re.UNICODE
+        letters = ""
+        for flag, letter in _FLAGS:
+            if flags & flag:
+                letters += letter
+                flags &= ~flag
+        if flags:
+            raise ValueError("Cannot combine %r" % regexp)
+
+        prefix = "_q%s_" % index
+        self.groups[prefix[:-1]] = (
+            index,
+            [(prefix + name, name) for name in regexp.groupindex],
+        )
+        if _POSITIONAL.search(source):
+            self.slice = True
+
+        source = _GROUP_NAME.sub(
+            lambda match: "(?%s%s%s" % (match.group(1), prefix, match.group(2)),
+            source,
+        )
+        if re.compile(source, regexp.flags).groups != regexp.groups:
+            raise ValueError("Cannot combine %r" % regexp)
+        # The empty group is closed last and becomes ``match.lastgroup``.
+        # Alternatives starting with literals are skipped quickly by the
+        # regex engine when the character does not match.
+        return "(?%s:%s%s)(?P<%s>)" % (
+            letters,
+            source,
+            "\n" if "x" in letters else "",
+            prefix[:-1],
+        )
+
+    def match(self, string, pos, endpos):
+        """
+        Returns a tuple of the length of the match, the groups dictionary
+        and the mapper of the first rule matching at ``pos``, or ``None``
+        """
+        if self.pattern is None or self.slice:
+            # Rules see the same string as when matching them one by one
+            string, pos, endpos = string[pos:endpos], 0, endpos - pos
+
+        if self.pattern is None:
+            for regexp, extract in self.rules:
+                match = regexp.match(string, pos, endpos)
+                if match:
+                    return match.end() - pos, match.groupdict(), extract
+            return None
+
+        match = self.pattern.match(string, pos, endpos)
+        if match is None:
+            return None
+        index, groups = self.groups[match.lastgroup]
+        return (
+            match.end() - pos,
+            {name: match.group(group) for group, name in groups},
+            self.rules[index][1],
+        )
+
+
+_compiled_rules = {}
+
+
+def compile_rules(rules):
+    """
+    Returns a :class:`QuickRules` instance for the list of
+    ``(regex, mapper)`` tuples. The instance is cached as long as the
+    list is not modified.
+    """
+    if isinstance(rules, QuickRules):
+        return rules
+
+    key = id(rules)
+    rules = list(rules)
+    cached = _compiled_rules.get(key)
+    # Comparing the (identical) rule tuples is cheap
+    if cached is None or cached.source != rules:
+        cached = QuickRules(rules)
+        if len(_compiled_rules) >= 100:
+            _compiled_rules.clear()
+        _compiled_rules[key] = cached
+    return cached
 
 
 def parse_quickadd(quick, regexes):
@@ -55,26 +200,64 @@ def parse_quickadd(quick, regexes):
     data = {}
     rest = []
 
-    while quick:
-        for regexp, extract in regexes:
-            match = regexp.match(quick)
-            if match:
-                for key, value in extract(match.groupdict()).items():
-                    data.setdefault(key, []).append(value)
+    if not quick:
+        return MultiValueDict(data), rest
+
+    rules = compile_rules(regexes)
+    matches = []
+    # The unparsed rest of the quick string is ``quick[pos:end]``
+    pos, end = 0, len(quick)
+
+    while pos < end:
+        match = rules.match(quick, pos, end)
+        if match:
+            length, values, extract = match
+            matches.append((extract, values))
+
+            # Only the first 9999 characters are kept after each match
+            end = min(end, pos + 9999)
+            pos += length
+            while pos < end and quick[pos].isspace():
+                pos += 1
+            while end > pos and quick[end - 1].isspace():
+                end -= 1
+            continue
+
+        space = quick.find(" ", pos, end)
+        if space < 0:
+            rest.append(quick[pos:end])
+            break
+
+        rest.append(quick[pos:space])
+        pos = space + 1
+
+    for mapped in map_matches(matches):
+        for key, value in mapped.items():
+            data.setdefault(key, []).append(value)
 
-                quick = quick[len(match.group(0)) : 9999].strip()
-                break
+    return MultiValueDict(data), rest
 
-        else:
-            splitted = quick.split(" ", 1)
-            if len(splitted) < 2:
-                rest.append(quick)
-                break
 
-            rest.append(splitted[0])
-            quick = splitted[1]
+def map_matches(matches):
+    """
+    Returns the mapped values for a list of ``(mapper, values)`` tuples.
+    Mappers with a ``map_many`` method (such as :func:`model_mapper`) are
+    called once with the values of all their matches.
+    """
+    mapped = [None] * len(matches)
+    batches = {}
+    for index, (extract, values) in enumerate(matches):
+        if hasattr(extract, "map_many"):
+            batches.setdefault(extract, []).append(index)
+        else:
+            mapped[index] = extract(values)
 
-    return MultiValueDict(data), rest
+    for extract, indices in batches.items():
+        for index, result in zip(
+            indices, extract.map_many([matches[index][1] for index in indices])
+        ):
+            mapped[index] = result
+    return mapped
 
 
 def identity():
@@ -85,25 +268,171 @@ def identity():
     return lambda value: value
 
 
-def model_mapper(queryset, attribute):
+class ModelMapper:
+    """
+    Implementation of :func:`model_mapper`
+    """
+
+    def __init__(self, queryset, attribute, timeout=0, maxsize=1000):
+        self.queryset = queryset
+        self.attribute = attribute
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._cache = {}
+
+    def __call__(self, values):
+        return self.map_many([values])[0]
+
+    def clear(self):
+        """
+        Empties the cache
+        """
+        self._cache.clear()
+
+    def map_many(self, values_list):
+        """
+        Returns a list of mapped values for a list of regex match
+        dictionaries, resolving all instances not cached yet at once
+        """
+        now = time.monotonic()
+        keys = []
+        missing = {}
+        for index, values in enumerate(values_list):
+            try:
+                key = tuple(sorted(values.items()))
+                cached = self._cache.get(key)
+            except TypeError:  # Unhashable values are never cached
+                key, cached = index, None
+            keys.append(key)
+
+            if cached is None or cached[0] < now:
+                missing[key] = values
+
+        found = dict(zip(missing, self.resolve(list(missing.values()))))
+        if self.timeout:
+            if len(self._cache) + len(found) > self.maxsize:
+                self._cache.clear()
+            for key, instance in found.items():
+                # Misses are not cached, the instance may be created soon
+                if isinstance(key, tuple) and instance is not None:
+                    self._cache[key] = (now + self.timeout, instance)
+
+        mapped = []
+        for key in keys:
+            instance = found[key] if key in found else self._cache[key][1]
+            mapped.append(
+                {}
+                if instance is None
+                else {self.attribute: instance.pk, self.attribute + "_": instance}
+            )
+        return mapped
+
+    def resolve(self, values_list):
+        """
+        Returns the instance (or ``None``) for each dictionary in
+        ``values_list``. Dictionaries containing field names only are
+        resolved using one query per set of fields, everything else using
+        ``queryset.get()``.
+        """
+        instances = [None] * len(values_list)
+        by_fields = {}
+        for index, values in enumerate(values_list):
+            fields = self._fields(values)
+            if fields is None:
+                instances[index] = self.get(values)
+                continue
+
+            try:
+                value = tuple(field.to_python(values[name]) for name, field in fields)
+            except (TypeError, ValueError, ValidationError):
+                continue
+            by_fields.setdefault(fields, {}).setdefault(value, []).append(index)
+
+        for fields, by_value in by_fields.items():
+            if len(fields) == 1:
+                condition = Q(**{fields[0][1].name + "__in": [v[0] for v in by_value]})
+            else:
+                condition = reduce(
+                    operator.or_,
+                    (
+                        Q(**{field.name: v for (name, field), v in zip(fields, value)})
+                        for value in by_value
+                    ),
+                )
+
+            objects = {}
+            for instance in self.queryset.filter(condition):
+                value = tuple(
+                    getattr(instance, field.attname) for name, field in fields
+                )
+                objects.setdefault(value, []).append(instance)
+
+            unmatched = sum(len(o) for o in objects.values())
+            for value, indices in by_value.items():
+                matches = objects.get(value, [])
+                if len(matches) > 1:
+                    raise self.queryset.model.MultipleObjectsReturned(
+                        "get() returned more than one %s -- it returned %s!"
+                        % (self.queryset.model._meta.object_name, len(matches))
+                    )
+                unmatched -= len(matches)
+                for index in indices:
+                    instances[index] = matches[0] if matches else None
+
+            if unmatched:
+                # The database compares differently (f.e. case-insensitive
+                # collations), resolve the values not found one by one
+                for value, indices in by_value.items():
+                    if value not in objects:
+                        instance = self.get(values_list[indices[0]])
+                        for index in indices:
+                            instances[index] = instance
+
+        return instances
+
+    def get(self, values):
+        try:
+            return self.queryset.get(**values)
+        except (self.queryset.model.DoesNotExist, KeyError, TypeError, ValueError):
+            return None
+
+    def _fields(self, values):
+        """
+        Returns a tuple of ``(name, field)`` tuples if all keys of
+        ``values`` are names of concrete fields, ``None`` otherwise
+        """
+        opts = self.queryset.model._meta
+        fields = []
+        for name, value in sorted(values.items()):
+            if value is None:
+                return None
+            try:
+                field = opts.pk if name == "pk" else opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.many_to_many:
+                return None
+            fields.append((name, field))
+        return tuple(fields) or None
+
+
+def model_mapper(queryset, attribute, timeout=0):
     """
     The regular expression needs to return a dict which is directly passed
     to ``queryset.get()``. As a speciality, this mapper returns both the
     primary key of the instance under the ``attribute`` name, and the instance
     itself as ``attribute_``.
-    """
 
-    def _fn(values):
-        try:
-            instance = queryset.get(**values)
-            return {
-                attribute: instance.pk,
-                attribute + "_": instance,
-            }
-        except (queryset.model.DoesNotExist, KeyError, TypeError, ValueError):
-            return {}
+    All matches of a quick string are resolved together using one query
+    if the named groups of the regular expression are field names.
 
-    return _fn
+    Pass ``timeout`` to cache found instances for this many seconds. The
+    cache is disabled by default because it lives as long as the mapper
+    (usually the whole process) and shares the same instances between
+    threads and requests; only use it for rarely changing, read-only
+    data. Values which did not match an instance are never cached.
+    """
+    return ModelMapper(queryset, attribute, timeout=timeout)
 
 
 def static(**kwargs):
@@ -133,8 +462,14 @@ def model_choices_mapper(data, attribute):
             ]
     """
 
+    # Reverse mappings of the choices, by language
+    tables = {}
+
     def _fn(values):
-        reverse = {force_str(value): key for key, value in data}
+        language = get_language()
+        reverse = tables.get(language)
+        if reverse is None:
+            reverse = tables[language] = {force_str(value): key for key, value in data}
         try:
             return {attribute: reverse[values["value"]]}
         except KeyError:
@@ -149,17 +484,28 @@ def due_mapper(attribute):
     week day names or (partial) dates such as ``20.12.`` and ``01.03.2012``.
     """
 
+    # Mappings of localized day names to dates, by language and day
+    tables = {}
+
     def _fn(values):
         today = date.today()
         due = values["due"]
 
-        days = [
-            (dateformat.format(d, "l"), d)
-            for d in [(today + timedelta(days=d)) for d in range(2, 7)]
-        ]
-        days.append((_("Today"), today))
-        days.append((_("Tomorrow"), today + timedelta(days=1)))
-        days = {k.lower(): value for k, value in days}
+        key = (get_language(), today)
+        days = tables.get(key)
+        if days is None:
+            days = [
+                (dateformat.format(d, "l"), d)
+                for d in [(today + timedelta(days=d)) for d in range(2, 7)]
+            ]
+            days.append((_("Today"), today))
+            days.append((_("Tomorrow"), today + timedelta(days=1)))
+            days = {k.lower(): value for k, value in days}
+
+            # Drop the tables of previous days
+            for old in [old for old in tables if old[1] != today]:
+                tables.pop(old, None)
+            tables[key] = days
 
         if due.lower() in days:
             return {attribute: days[due.lower()]}
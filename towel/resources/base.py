@@ -34,12 +34,18 @@ from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import NoReverseMatch
 from django.utils.encoding import force_str
+from django.utils.html import format_html
 from django.utils.text import capfirst
 from django.utils.translation import gettext as _
 from django.views.generic.base import TemplateView
 
-from towel.forms import BatchForm, towel_formfield_callback
-from towel.paginator import EmptyPage, InvalidPage, Paginator
+from towel.forms import (
+    BatchForm,
+    search_criteria,
+    search_form_data,
+    towel_formfield_callback,
+)
+from towel.paginator import Paginator
 from towel.utils import (
     app_model_label,
     changed_regions,
@@ -247,9 +253,25 @@ class ListView(ModelResourceView):
     #: Objects per page. Defaults to ``None`` which means no pagination.
     paginate_by = None
 
+    #: Paginator class. Use ``towel.paginator.KeysetPaginator`` for big
+    #: tables where deep ``OFFSET`` pages are too slow.
+    paginator_class = Paginator
+
+    #: Count strategy passed to the paginator, f.e.
+    #: ``towel.paginator.CappedCount(10000)``. ``None`` uses the default
+    #: strategy of the paginator class.
+    count_strategy = None
+
     #: Search form class.
     search_form = None
 
+    #: The batch form of the current request, if there are batch actions.
+    batch_form = None
+
+    #: Number of items shown on confirmation pages of batch actions when
+    #: all matching items have been selected.
+    batch_preview_limit = 100
+
     #: ``object_list.html`` it is.
     template_name_suffix = "_list"
 
@@ -271,16 +293,15 @@ class ListView(ModelResourceView):
         if object_list is not None:
             paginate_by = self.get_paginate_by(object_list)
             if paginate_by:
-                paginator = Paginator(object_list, paginate_by)
+                kwargs = {}
+                if self.count_strategy is not None:
+                    kwargs["count_strategy"] = self.count_strategy
+                paginator = self.paginator_class(object_list, paginate_by, **kwargs)
 
-                try:
-                    page = int(self.request.GET.get("page"))
-                except (TypeError, ValueError):
-                    page = 1
-                try:
-                    page = paginator.page(page)
-                except (EmptyPage, InvalidPage):
-                    page = paginator.page(paginator.num_pages)
+                if hasattr(paginator, "page_for_request"):
+                    page = paginator.page_for_request(self.request)
+                else:
+                    page = paginator.get_page(self.request.GET.get("page"))
 
                 context.update(
                     {
@@ -300,7 +321,9 @@ class ListView(ModelResourceView):
         context = {}
 
         if self.search_form:
-            form = self.search_form(self.request.GET, request=self.request)
+            form = self.search_form(
+                search_form_data(self.request), request=self.request
+            )
             if not form.is_valid():
                 messages.error(self.request, _("The search query was invalid."))
                 return HttpResponseRedirect("?clear=1")
@@ -315,13 +338,14 @@ class ListView(ModelResourceView):
         actions = self.get_batch_actions()
         if actions:
             form = BatchForm(self.request, self.object_list)
+            form.criteria = search_criteria(context.get("search_form"))
             form.actions = actions
             form.fields["action"] = forms.ChoiceField(
                 label=_("Action"),
                 choices=[("", "---------")] + [row[:2] for row in actions],
                 widget=forms.HiddenInput,
             )
-            context["batch_form"] = form
+            context["batch_form"] = self.batch_form = form
 
             if form.should_process():
                 action = form.cleaned_data.get("action")
@@ -329,6 +353,11 @@ class ListView(ModelResourceView):
                 result = fn(form.batch_queryset)
                 if isinstance(result, HttpResponse):
                     return result
+                elif form.select_all and hasattr(result, "__iter__"):
+                    messages.success(
+                        self.request,
+                        _("Processed %s items.") % form.processed_count(result),
+                    )
                 elif hasattr(result, "__iter__"):
                     messages.success(
                         self.request,
@@ -372,16 +401,20 @@ class ListView(ModelResourceView):
         action handler. Most useful for batch action handlers needing to
         present a confirmation and/or form page to the user.
 
-        See ``delete_selected`` below for the usage.
+        See ``delete_selected`` below for the usage. The search criteria are
+        passed on instead of ids if all matching items have been selected.
         """
-        post_values = (
-            [("batchform", 1)]
-            + additional
-            + [("batch_%s" % item.pk, "1") for item in queryset]
-        )
+        if self.batch_form is not None and self.batch_form.select_all:
+            selection = [
+                ("batchform_all", 1),
+                ("batchform_criteria", self.batch_form.signed_criteria),
+            ]
+        else:
+            selection = [("batch_%s" % item.pk, "1") for item in queryset]
 
         return "\n".join(
-            '<input type="hidden" name="%s" value="%s">' % item for item in post_values
+            format_html('<input type="hidden" name="{}" value="{}">', *item)
+            for item in [("batchform", 1)] + additional + selection
         )
 
     def delete_selected(self, queryset):
@@ -391,6 +424,9 @@ class ListView(ModelResourceView):
         - Their deletion is allowed.
         - Confirmation is given on a confirmation page.
         """
+        if self.batch_form is not None and self.batch_form.select_all:
+            return self.delete_all_matching(queryset)
+
         allowed = [self.allow_delete(item) for item in queryset]
         queryset = [item for item, perm in zip(queryset, allowed) if perm]
 
@@ -426,6 +462,45 @@ class ListView(ModelResourceView):
         self.template_name_suffix = "_action"
         return self.render_to_response(context)
 
+    def delete_all_matching(self, queryset):
+        """
+        ``delete_selected`` when all matching items have been selected. Items
+        are checked and deleted in chunks, the confirmation page only shows
+        the first ``batch_preview_limit`` items.
+        """
+        if "confirm" in self.request.POST:
+            deleted = skipped = 0
+            for chunk in self.batch_form.batch_chunks():
+                for item in chunk:
+                    if self.allow_delete(item):
+                        item.delete()
+                        deleted += 1
+                    else:
+                        skipped += 1
+
+            if deleted:
+                messages.success(
+                    self.request, _("Deletion of %s objects successful.") % deleted
+                )
+            if skipped:
+                messages.warning(
+                    self.request,
+                    _("Deletion of %s objects not allowed, those have been skipped.")
+                    % skipped,
+                )
+            return
+
+        context = super().get_context_data(
+            title=_("Delete selected"),
+            action_queryset=queryset[: self.batch_preview_limit],
+            action_count=queryset.count(),
+            action_hidden_fields=self.batch_action_hidden_fields(
+                queryset, [("batch-action", "delete_selected"), ("confirm", 1)]
+            ),
+        )
+        self.template_name_suffix = "_action"
+        return self.render_to_response(context)
+
 
 class DetailView(ModelResourceView):
     """
@@ -671,6 +746,9 @@ class PickerView(ModelResourceView):
 
     template_name_suffix = "_picker"
 
+    #: If set, searches only return this many objects, ordered by relevance
+    search_limit = None
+
     def get_title(self):
         return capfirst(_("Select a %s") % self.model._meta.verbose_name)
 
@@ -679,7 +757,12 @@ class PickerView(ModelResourceView):
         regions = None
         query = request.GET.get("query")
 
-        if query is not None:
+        if query is not None and self.search_limit:
+            self.object_list = self.model.objects._search(
+                query, queryset=self.object_list, limit=self.search_limit
+            )
+            regions = {}
+        elif query is not None:
             self.object_list = safe_queryset_and(
                 self.object_list, self.model.objects._search(query)
             )
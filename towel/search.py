@@ -0,0 +1,259 @@
+"""
+Global search
+=============
+
+Searches several models with a ``SearchManager`` at once and groups the
+results by model::
+
+    from towel.search import GlobalSearch
+
+    global_search = GlobalSearch(
+        [Book, Author, (Publisher, {"limit": 3, "fields": ("name",)})],
+        limit=10,
+        timeout=0.5,
+    )
+
+    def search(request):
+        groups = global_search.search(
+            request.GET.get("q", ""), access=getattr(request, "access", None)
+        )
+        return render(request, "search.html", {"groups": groups})
+
+The searches run concurrently on a thread pool shared by all searches (see
+``search_executor``), each returning the ``limit`` most relevant objects.
+Searches taking longer than ``timeout`` seconds after they have started are
+abandoned (and cancelled using ``statement_timeout`` on PostgreSQL).
+Searches still waiting for a worker thread after ``timeout`` seconds are
+not started at all. If an ``access`` object is passed and the default
+manager of a model has a ``for_access`` method (see ``towel.mt``), only
+objects returned by ``for_access(access)`` are searched.
+
+The worker threads use their own database connections, which are kept
+open according to ``CONN_MAX_AGE``, and cannot see uncommitted changes;
+searches therefore run one after another in the calling thread inside
+atomic blocks. Use ``transaction.non_atomic_requests`` on search views when
+using ``ATOMIC_REQUESTS``.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+
+from django.conf import settings
+from django.db import (
+    OperationalError,
+    close_old_connections,
+    connections,
+    transaction,
+)
+
+
+_executor = None
+_executor_lock = Lock()
+
+
+def search_executor():
+    """
+    Returns the thread pool shared by all searches. Its size is bounded by
+    the ``TOWEL_SEARCH_WORKERS`` setting (default ``8``), which also bounds
+    the number of additional database connections and of abandoned searches
+    still running.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "TOWEL_SEARCH_WORKERS", 8),
+                thread_name_prefix="towel-search",
+            )
+        return _executor
+
+
+class SearchGroup:
+    """
+    The search results of one model
+    """
+
+    def __init__(self, model, objects=(), has_more=False, timed_out=False):
+        #: The searched model
+        self.model = model
+        #: The most relevant objects
+        self.objects = list(objects)
+        #: Whether there are more results than ``objects``
+        self.has_more = has_more
+        #: Whether the search did not finish in time
+        self.timed_out = timed_out
+
+    def __repr__(self):
+        return "<SearchGroup: %s (%s%s)>" % (
+            self.model._meta.label,
+            len(self.objects),
+            "+" if self.has_more else "",
+        )
+
+    @property
+    def verbose_name_plural(self):
+        return self.model._meta.verbose_name_plural
+
+
+class GlobalSearch:
+    """
+    Searches all ``models`` concurrently, at most ``max_workers`` of them
+    at a time. Entries may also be ``(model, options)`` tuples, where
+    ``options`` is a dictionary overriding ``limit`` and ``timeout`` or
+    specifying the search ``fields`` of this model.
+    """
+
+    def __init__(self, models, limit=10, timeout=1.0, max_workers=4):
+        self.models = [
+            (model[0], model[1]) if isinstance(model, (list, tuple)) else (model, {})
+            for model in models
+        ]
+        self.limit = limit
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+    def queryset(self, model, access=None):
+        """
+        Returns the queryset searched for ``model``, restricted using
+        ``for_access`` if possible
+        """
+        manager = model._default_manager
+        if access is not None and hasattr(manager, "for_access"):
+            return manager.for_access(access)
+        return manager.all()
+
+    def search_model(self, model, options, query, access=None):
+        """
+        Returns a ``SearchGroup`` containing the results for ``model``
+        """
+        limit = options.get("limit", self.limit)
+        queryset = model._default_manager._search(
+            query,
+            fields=options.get("fields"),
+            queryset=self.queryset(model, access),
+            limit=limit + 1,
+        )
+
+        timeout = options.get("timeout", self.timeout)
+        connection = connections[queryset.db]
+        if connection.vendor == "postgresql" and timeout:
+            # SET LOCAL lasts until the end of the outermost transaction, not
+            # only until the savepoint is released
+            restore = connection.in_atomic_block
+            try:
+                with transaction.atomic(using=queryset.db):
+                    with connection.cursor() as cursor:
+                        if restore:
+                            cursor.execute("SHOW statement_timeout")
+                            previous = cursor.fetchone()[0]
+                        cursor.execute(
+                            "SET LOCAL statement_timeout = %s", [int(timeout * 1000)]
+                        )
+                    objects = list(queryset)
+                    if restore:
+                        # Errors roll back the savepoint, which restores
+                        # the setting too
+                        with connection.cursor() as cursor:
+                            cursor.execute(
+                                "SET LOCAL statement_timeout = %s", [previous]
+                            )
+            except OperationalError:
+                return SearchGroup(model, timed_out=True)
+        else:
+            objects = list(queryset)
+
+        return SearchGroup(model, objects[:limit], has_more=len(objects) > limit)
+
+    def _search_in_thread(self, started, index, *args):
+        started[index] = time.monotonic()
+        # Database connections of worker threads are kept and recycled the
+        # same way Django recycles them between requests
+        close_old_connections()
+        try:
+            return self.search_model(*args)
+        finally:
+            close_old_connections()
+
+    def search(self, query, access=None):
+        """
+        Returns a list of ``SearchGroup`` instances in the order of
+        ``models``, leaving out models without results
+        """
+        if not query or not query.strip() or not self.models:
+            return []
+
+        if any(
+            connections[model._default_manager.db].in_atomic_block
+            for model, options in self.models
+        ):
+            groups = [
+                self.search_model(model, options, query, access)
+                for model, options in self.models
+            ]
+            return [group for group in groups if group.objects or group.timed_out]
+
+        submitted = time.monotonic()
+        started = {}
+        groups = [None] * len(self.models)
+        queued = list(range(len(self.models)))
+        pending = {}
+
+        def budget(index):
+            return self.models[index][1].get("timeout", self.timeout)
+
+        while queued or pending:
+            while queued and len(pending) < self.max_workers:
+                index = queued.pop(0)
+                model, options = self.models[index]
+                future = search_executor().submit(
+                    self._search_in_thread,
+                    started,
+                    index,
+                    model,
+                    options,
+                    query,
+                    access,
+                )
+                pending[future] = index
+
+            now = time.monotonic()
+            deadlines = {}
+            for future, index in list(pending.items()):
+                model = self.models[index][0]
+                # The budget starts when the search starts; queued searches
+                # may wait for a worker for as long
+                deadline = started.get(index, submitted) + budget(index)
+                if future.done():
+                    groups[index] = future.result()
+                elif now < deadline:
+                    deadlines[future] = deadline
+                    continue
+                elif index in started or future.cancel():
+                    # Abandoned searches keep their worker until they finish
+                    groups[index] = SearchGroup(model, timed_out=True)
+                else:
+                    # Has just been started by a worker
+                    deadlines[future] = started.setdefault(index, now) + budget(index)
+                    continue
+                del pending[future]
+
+            for index in list(queued):
+                if now >= submitted + budget(index):
+                    queued.remove(index)
+                    groups[index] = SearchGroup(self.models[index][0], timed_out=True)
+
+            if queued and len(pending) < self.max_workers:
+                continue
+            if deadlines:
+                wait(
+                    deadlines,
+                    timeout=min(
+                        [*deadlines.values()]
+                        + [submitted + budget(index) for index in queued]
+                    )
+                    - now,
+                    return_when=FIRST_COMPLETED,
+                )
+
+        return [group for group in groups if group.objects or group.timed_out]
@@ -3,6 +3,7 @@ from django.db import models
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
 
+from towel.modelview import StreamingObjectList
 from towel.templatetags import towel_resources
 
 
@@ -66,3 +67,47 @@ def model_row(instance, fields):
             value = getattr(instance, f.name)
 
         yield (f.verbose_name, value)
+
+
+@register.tag
+def stream_for(parser, token):
+    """
+    Works like ``{% for %}`` with a single loop variable, but renders the
+    rows incrementally when showing all objects::
+
+        {% stream_for object in object_list %}
+            <tr><td>{{ object }}</td></tr>
+        {% endstream_for %}
+
+    If ``object_list`` is a ``towel.modelview.StreamingObjectList``, the
+    contents are not rendered right away; the model view sends the rows
+    chunk by chunk using a ``StreamingHttpResponse`` instead. ``forloop`` is
+    not available inside ``{% stream_for %}``.
+    """
+    bits = token.split_contents()
+    if len(bits) != 4 or bits[2] != "in":
+        raise template.TemplateSyntaxError(
+            "'%s' statements should use the format"
+            " '%s item in sequence'" % (bits[0], bits[0])
+        )
+    nodelist = parser.parse(("endstream_for",))
+    parser.delete_first_token()
+    return StreamForNode(bits[1], parser.compile_filter(bits[3]), nodelist)
+
+
+class StreamForNode(template.Node):
+    def __init__(self, loopvar, sequence, nodelist):
+        self.loopvar = loopvar
+        self.sequence = sequence
+        self.nodelist = nodelist
+
+    def render(self, context):
+        values = self.sequence.resolve(context, ignore_failures=True)
+        if isinstance(values, StreamingObjectList):
+            return values.capture(context, self.loopvar, self.nodelist)
+
+        output = []
+        for item in values or ():
+            with context.push(**{self.loopvar: item}):
+                output.append(self.nodelist.render(context))
+        return mark_safe("".join(output))
@@ -1,5 +1,9 @@
 from django import template
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from django.utils.translation import gettext as _
+
+from towel.paginator import CountlessPaginator, KeysetPaginator
 
 
 register = template.Library()
@@ -27,6 +31,45 @@ def batch_checkbox(form, id):
     cb = '<input type="checkbox" name="batch_%s" value="%s" class="batch" %s>'
 
     if id in form.ids:
-        return cb % (id, id, 'checked="checked" ')
+        return mark_safe(cb % (id, id, 'checked="checked" '))
 
     return mark_safe(cb % (id, id, ""))
+
+
+@register.simple_tag
+def batch_select_all(form, paginator=None):
+    """
+    Checkbox which selects all objects matching the current search instead
+    of the checked objects only. The search criteria are posted instead of
+    ids in this case::
+
+        {% batch_select_all batch_form paginator %}
+
+    The number of matching objects is shown if ``paginator`` is given and
+    is neither a ``CountlessPaginator`` nor a ``KeysetPaginator``, which
+    avoid counting.
+    """
+
+    if not form or not hasattr(form, "criteria"):
+        return ""
+
+    if paginator and not isinstance(paginator, (CountlessPaginator, KeysetPaginator)):
+        approximation = getattr(paginator, "count_approximation", None)
+        if approximation == "estimated":
+            count = "~%s" % paginator.count
+        elif approximation == "capped":
+            count = "%s+" % paginator.count
+        else:
+            count = paginator.count
+        label = _("Select all %s matching items") % count
+    else:
+        label = _("Select all matching items")
+
+    return format_html(
+        '<label class="batch-all"><input type="checkbox" name="batchform_all"'
+        ' value="1"{}> {}</label>'
+        '<input type="hidden" name="batchform_criteria" value="{}">',
+        mark_safe(' checked="checked"') if form.select_all else "",
+        label,
+        form.signed_criteria,
+    )
@@ -31,11 +31,14 @@ def pagination(context, page, paginator, where=None):
 
 
 @register.filter
-def querystring(data, exclude="page,all"):
+def querystring(data, exclude="page,all,after,before"):
     """
     Returns the current querystring, excluding specified GET parameters::
 
         {% request.GET|querystring:"page,all" %}
+
+    The pagination parameters ``page`` and ``all`` and the keyset cursors
+    ``after`` and ``before`` are excluded by default.
     """
 
     exclude = exclude.split(",")
@@ -91,7 +94,7 @@ def ordering_link(context, field, request, title="", base_url="", **kwargs):
             data = form.data
 
     ctx = {
-        "querystring": querystring(data, exclude="page,all,o"),
+        "querystring": querystring(data, exclude="page,all,after,before,o"),
         "field": field,
         "used": current in (field, "-%s" % field),
         "descending": current == field,
@@ -0,0 +1,25 @@
+"""
+Trigram index for ``SearchManager``
+===================================
+
+Optional, database-agnostic inverted index mapping trigrams (lowercased
+three character substrings) of the ``search_fields`` to the objects
+containing them. Add ``towel.trigram`` to ``INSTALLED_APPS`` and use the
+``TrigramSearchBackend``::
+
+    from towel.managers import SearchManager
+    from towel.trigram.index import TrigramSearchBackend
+
+    class BookManager(SearchManager):
+        search_fields = ("title", "publisher__name")
+        search_backend = TrigramSearchBackend()
+
+Searches resolve candidate primary keys using the index first; the
+``icontains`` lookups only have to verify those candidates instead of
+scanning the whole table. Models using the backend are registered
+automatically; the index is kept up to date through ``post_save`` and
+``post_delete`` signals of the model itself. Changes to related objects
+(e.g. ``publisher__name`` above) are not tracked, run the
+``rebuild_trigram_index`` management command periodically if you index
+related fields, and initially to build the index.
+"""
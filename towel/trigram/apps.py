@@ -0,0 +1,20 @@
+from django.apps import AppConfig, apps
+from django.utils.translation import gettext_lazy as _
+
+
+class TrigramConfig(AppConfig):
+    name = "towel.trigram"
+    label = "towel_trigram"
+    verbose_name = _("trigram index")
+    default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        from towel.trigram.index import TrigramSearchBackend, register
+
+        for model in apps.get_models():
+            for manager in model._meta.managers:
+                if isinstance(
+                    getattr(manager, "search_backend", None), TrigramSearchBackend
+                ):
+                    register(model, manager.search_fields)
+                    break
@@ -0,0 +1,183 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete, post_save
+
+from towel.managers import IContainsSearchBackend
+from towel.trigram.models import Trigram
+
+
+#: Registered models and their indexed fields
+registry = {}
+
+
+def trigrams(value):
+    """
+    Returns the set of lowercased trigrams of ``value``
+
+    Example::
+
+        >>> sorted(trigrams("Hello"))
+        ['ell', 'hel', 'llo']
+
+    """
+    value = str(value).lower()
+    return {value[i : i + 3] for i in range(len(value) - 2)}
+
+
+def object_trigrams(rows):
+    """
+    Returns a dictionary mapping primary keys to the trigrams of all
+    values in ``rows``, an iterable of ``(pk, value, ...)`` tuples as
+    returned by ``values_list("pk", *fields)``
+    """
+    grams = {}
+    for pk, *values in rows:
+        grams.setdefault(pk, set()).update(
+            *(trigrams(value) for value in values if value is not None)
+        )
+    return grams
+
+
+def _pk_field(model):
+    pk = model._meta.pk
+    return pk.target_field if pk.is_relation else pk
+
+
+def object_id(model, pk):
+    """
+    Returns the primary key in the format of the database as stored in
+    ``Trigram.object_id``, f.e. UUIDs without hyphens on databases without
+    a native UUID type, so that ``TrigramSearchBackend.candidates`` can
+    cast it back for comparing it with the primary key column
+    """
+    value = _pk_field(model).get_db_prep_value(
+        pk, connection=connections[Trigram.objects.db]
+    )
+    return str(value)
+
+
+def _trigram_rows(model, content_type, grams):
+    return [
+        Trigram(
+            content_type=content_type,
+            object_id=object_id(model, pk),
+            trigram=trigram,
+        )
+        for pk, object_grams in grams.items()
+        for trigram in object_grams
+    ]
+
+
+def update_index(model, pks):
+    """
+    Updates the index entries of the given primary keys of ``model``
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    grams = object_trigrams(
+        model._base_manager.filter(pk__in=pks).values_list("pk", *registry[model])
+    )
+    with transaction.atomic(using=Trigram.objects.db):
+        Trigram.objects.filter(
+            content_type=content_type,
+            object_id__in=[object_id(model, pk) for pk in pks],
+        ).delete()
+        Trigram.objects.bulk_create(_trigram_rows(model, content_type, grams))
+
+
+def rebuild_index(model, chunk_size=2000):
+    """
+    Rebuilds the index entries of all instances of ``model``, returns the
+    number of indexed objects
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    queryset = model._base_manager.order_by("pk").values_list("pk", *registry[model])
+    count = 0
+    with transaction.atomic(using=Trigram.objects.db):
+        Trigram.objects.filter(content_type=content_type).delete()
+        # Rows of the same object are adjacent because of the ordering
+        rows = []
+        for row in queryset.iterator(chunk_size=chunk_size):
+            if len(rows) >= chunk_size and rows[-1][0] != row[0]:
+                grams = object_trigrams(rows)
+                Trigram.objects.bulk_create(_trigram_rows(model, content_type, grams))
+                count += len(grams)
+                rows = []
+            rows.append(row)
+        grams = object_trigrams(rows)
+        Trigram.objects.bulk_create(_trigram_rows(model, content_type, grams))
+        count += len(grams)
+    return count
+
+
+def _post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_index(sender, [instance.pk])
+
+
+def _post_delete(sender, instance, **kwargs):
+    Trigram.objects.filter(
+        content_type=ContentType.objects.get_for_model(sender),
+        object_id=object_id(sender, instance.pk),
+    ).delete()
+
+
+def register(model, fields):
+    """
+    Indexes ``fields`` of ``model`` and keeps the index up to date when
+    instances are saved or deleted. Called automatically for models whose
+    manager uses ``TrigramSearchBackend``.
+    """
+    registry[model] = tuple(fields)
+    post_save.connect(_post_save, sender=model, dispatch_uid="towel_trigram")
+    post_delete.connect(_post_delete, sender=model, dispatch_uid="towel_trigram")
+
+
+def unregister(model):
+    registry.pop(model, None)
+    post_save.disconnect(sender=model, dispatch_uid="towel_trigram")
+    post_delete.disconnect(sender=model, dispatch_uid="towel_trigram")
+
+
+class TrigramSearchBackend(IContainsSearchBackend):
+    """
+    Search backend resolving candidates using the trigram index before
+    verifying them using ``icontains`` lookups. Keywords shorter than three
+    characters, negated keywords and searches in fields which are not
+    indexed cannot be narrowed down using the index.
+    """
+
+    def candidates(self, model, keyword):
+        """
+        Returns a subquery of primary keys of ``model`` instances having all
+        trigrams of ``keyword``, or ``None`` if the index cannot help
+        """
+        grams = trigrams(keyword)
+        if not grams:
+            return None
+
+        pk = _pk_field(model)
+        return (
+            Trigram.objects.filter(
+                content_type=ContentType.objects.get_for_model(model),
+                trigram__in=grams,
+            )
+            .annotate(object_pk=Cast("object_id", output_field=pk.__class__()))
+            .values("object_pk")
+            .annotate(matched=Count("id"))
+            .filter(matched=len(grams))
+            .values("object_pk")
+        )
+
+    def compile(self, queryset, terms, fields):
+        condition = super().compile(queryset, terms, fields)
+        if set(fields) <= set(registry.get(queryset.model, ())):
+            for keyword, negate in terms:
+                if negate:
+                    continue
+                candidates = self.candidates(queryset.model, keyword)
+                if candidates is not None:
+                    condition = Q(pk__in=candidates) & condition
+
+        return condition
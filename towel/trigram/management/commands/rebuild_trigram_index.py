@@ -0,0 +1,31 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from towel.trigram.index import rebuild_index, registry
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the trigram search index of all or the given models."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models", nargs="*", metavar="app_label.ModelName", help="Models to index"
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options["models"]:
+            try:
+                models = [apps.get_model(label) for label in options["models"]]
+            except (LookupError, ValueError) as exc:
+                raise CommandError(str(exc))
+        else:
+            models = list(registry)
+
+        for model in models:
+            if model not in registry:
+                raise CommandError(
+                    "%s does not use the trigram index." % model._meta.label
+                )
+            count = rebuild_index(model, chunk_size=options["chunk_size"])
+            self.stdout.write("%s: Indexed %s objects" % (model._meta.label, count))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Trigram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.CharField(max_length=64, verbose_name="object ID"),
+                ),
+                ("trigram", models.CharField(max_length=3, verbose_name="trigram")),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                        verbose_name="content type",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "trigram",
+                "verbose_name_plural": "trigrams",
+                "indexes": [
+                    models.Index(
+                        fields=["content_type", "trigram", "object_id"],
+                        name="towel_trigr_content_bce9ce_idx",
+                    ),
+                    models.Index(
+                        fields=["content_type", "object_id"],
+                        name="towel_trigr_content_4f86cf_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class Trigram(models.Model):
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, verbose_name=_("content type")
+    )
+    object_id = models.CharField(_("object ID"), max_length=64)
+    trigram = models.CharField(_("trigram"), max_length=3)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["content_type", "trigram", "object_id"]),
+            models.Index(fields=["content_type", "object_id"]),
+        ]
+        verbose_name = _("trigram")
+        verbose_name_plural = _("trigrams")
+
+    def __str__(self):
+        return self.trigram